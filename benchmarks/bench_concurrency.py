@@ -0,0 +1,206 @@
+"""
+并发筛选的负载测试：通过本地的 NoneBot 适配器同时发送大量 /筛选 命令，检查相同的并发筛选
+只计算一次并且得到相同的回复。
+
+用法：
+    python benchmarks/bench_concurrency.py --data-dir <包含 merged_character_data.json 的目录>
+        [--users 200] [--queries "六星 狙击" "术师 女"] [--rounds 5] [--output result.json]
+
+每轮由 users 个新用户同时发送命令，命令在 queries 之间轮换；每轮开始前清空共享结果缓存，
+使每轮的筛选都需要重新计算。第一轮同时包含数据集的加载。输出每轮的总耗时、单条命令的延迟
+分位数，以及请求合并与结果缓存的统计。同一条件的回复不一致时以非零状态退出。
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+import nonebot
+from common import bootstrap
+from nonebot.adapters import Adapter, Bot, Event, Message, MessageSegment
+from nonebot.message import handle_event
+from typing_extensions import override
+
+
+class TextSegment(MessageSegment["TextMessage"]):
+    @classmethod
+    @override
+    def get_message_class(cls):
+        return TextMessage
+
+    @override
+    def __str__(self):
+        return self.data["text"]
+
+    @override
+    def is_text(self):
+        return True
+
+
+class TextMessage(Message[TextSegment]):
+    @classmethod
+    @override
+    def get_segment_class(cls):
+        return TextSegment
+
+    @staticmethod
+    @override
+    def _construct(msg: str) -> Iterable[TextSegment]:
+        yield TextSegment("text", {"text": msg})
+
+
+class TextEvent(Event):
+    text: str
+    user: str
+
+    @override
+    def get_type(self):
+        return "message"
+
+    @override
+    def get_event_name(self):
+        return "message"
+
+    @override
+    def get_event_description(self):
+        return self.text
+
+    @override
+    def get_user_id(self):
+        return self.user
+
+    @override
+    def get_session_id(self):
+        return self.user
+
+    @override
+    def get_message(self):
+        return TextMessage(self.text)
+
+    @override
+    def is_tome(self):
+        return True
+
+
+class LocalAdapter(Adapter):
+    @classmethod
+    @override
+    def get_name(cls):
+        return "local"
+
+    @override
+    async def _call_api(self, bot: Bot, api: str, **data: object):
+        return None
+
+
+class LocalBot(Bot):
+    """
+    把回复记录在内存中的机器人。
+    """
+
+    def __init__(self, adapter: Adapter, self_id: str):
+        super().__init__(adapter, self_id)
+        self.replies: dict[str, list[str]] = {}
+
+    @override
+    async def send(self, event: Event, message: str | Message | MessageSegment, **kwargs: object):
+        self.replies.setdefault(event.get_user_id(), []).append(str(message))
+
+
+async def run_round(bot: LocalBot, prefix: str, users: int, queries: list[str]):
+    """
+    同时发送一轮命令，返回总耗时和每条命令的延迟。
+    """
+    latencies: list[float] = []
+
+    async def send(user: str, text: str):
+        start = time.perf_counter()
+        await handle_event(bot, TextEvent(text=text, user=user))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    _ = await asyncio.gather(
+        *(send(f"{prefix}-{i}", f"/筛选 {queries[i % len(queries)]}") for i in range(users))
+    )
+    return time.perf_counter() - start, latencies
+
+
+def check_replies(bot: LocalBot, prefix: str, users: int, queries: list[str]):
+    """
+    返回同一条件得到不同回复的条件。
+    """
+    seen: dict[str, set[str]] = {}
+    for i in range(users):
+        replies = bot.replies.get(f"{prefix}-{i}", [])
+        seen.setdefault(queries[i % len(queries)], set()).add("\n".join(replies))
+    return [query for query, replies in seen.items() if len(replies) > 1]
+
+
+async def run(args: argparse.Namespace):
+    import nonebot_plugin_ark_roulette as plugin
+
+    bot = LocalBot(LocalAdapter(nonebot.get_driver()), "bench")
+    rounds: list[dict[str, float]] = []
+    mismatches: list[str] = []
+    try:
+        for round_no in range(args.rounds):
+            plugin.result_cache.clear()
+            prefix = f"r{round_no}"
+            elapsed, latencies = await run_round(bot, prefix, args.users, args.queries)
+            mismatches += check_replies(bot, prefix, args.users, args.queries)
+            latencies.sort()
+            rounds.append(
+                {
+                    "elapsed": elapsed,
+                    "p50": statistics.median(latencies),
+                    "p95": latencies[int(len(latencies) * 0.95) - 1],
+                    "max": latencies[-1],
+                }
+            )
+    finally:
+        plugin.sessions.close()
+    return {
+        "rounds": rounds,
+        "flights": plugin.flights.stats(),
+        "result_cache": plugin.result_cache.stats(),
+        "sessions": plugin.sessions.stats(),
+    }, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    _ = parser.add_argument("--data-dir", type=Path, required=True)
+    _ = parser.add_argument("--users", type=int, default=200)
+    _ = parser.add_argument("--queries", nargs="+", default=["六星 狙击"])
+    _ = parser.add_argument("--rounds", type=int, default=5)
+    _ = parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    bootstrap(args.data_dir, max_sessions=args.users * args.rounds)
+    result, mismatches = asyncio.run(run(args))
+    if mismatches:
+        print(json.dumps({"mismatches": mismatches}, ensure_ascii=False, indent=2), file=sys.stderr)  # noqa: T201
+        sys.exit(1)
+
+    report = {
+        "python": platform.python_version(),
+        "users": args.users,
+        "queries": args.queries,
+        **result,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        _ = args.output.write_text(text, "utf-8")
+    print(text)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+数据加载的基准测试：
+
+- 原始数据表的各个加载函数，比较流式字段投影与完整 `json.loads` 的耗时和内存峰值；
+- 数据集冷启动，比较从 JSON 数据文件和从二进制快照构建数据集的耗时和内存峰值。
+
+用法：
+    python benchmarks/bench_load.py --data-dir <包含 merged_character_data.json 的目录> [--repeat 5]
+        [--output result.json] [--baseline baseline.json --tolerance 0.2]
+
+快照不存在或已过期时会先由 JSON 生成。内存峰值由 tracemalloc 统计，只包含 Python 对象，
+不包含快照 mmap 映射的页面。
+"""
+
+import argparse
+import inspect
+import json
+import platform
+import sys
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from common import bootstrap, compare_with_baseline, measure
+
+
+def peak_allocation(func: Callable[[], object]):
+    """
+    返回 func 运行期间 Python 内存分配的峰值（字节），运行结束前结果仍被引用。
+    """
+    tracemalloc.start()
+    try:
+        _result = func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def full_loader(loader: Callable[[], object], path: Path, keys: tuple[str, ...]):
+    """
+    用完整解析整个文件的方式调用加载函数，作为流式字段投影的对照。
+
+    加载函数可能还带有 `metrics.timed` 等装饰器，因此一直解包到最内层、接收数据表的原函数。
+    """
+    parse = inspect.unwrap(loader)
+
+    def load():
+        data = json.loads(path.read_bytes())
+        for key in keys:
+            data = data[key]
+        return parse(data)
+
+    return load
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    _ = parser.add_argument("--data-dir", type=Path, required=True)
+    _ = parser.add_argument("--repeat", type=int, default=5)
+    _ = parser.add_argument("--output", type=Path)
+    _ = parser.add_argument("--baseline", type=Path)
+    _ = parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    bootstrap(args.data_dir)
+
+    from nonebot_plugin_ark_roulette.dataset import Dataset, load_dataset
+    from nonebot_plugin_ark_roulette.handbook import load_handbook
+    from nonebot_plugin_ark_roulette.mapping import load_handbook_team_table, load_sub_profession_mapping
+    from nonebot_plugin_ark_roulette.saveData import load_character_data
+    from nonebot_plugin_ark_roulette.skin import load_skin_data
+    from nonebot_plugin_ark_roulette.snapshot import read_snapshot, snapshot_path
+
+    path = args.data_dir / "merged_character_data.json"
+    _ = load_dataset(path)
+
+    loaders: dict[str, Callable[[], object]] = {}
+    for loader, table, keys in (
+        (load_character_data, "character_table", ()),
+        (load_skin_data, "skin_table", ("charSkins",)),
+        (load_handbook, "handbook_info_table", ("handbookDict",)),
+        (load_sub_profession_mapping, "uniequip_table", ("subProfDict",)),
+        (load_handbook_team_table, "handbook_team_table", ()),
+    ):
+        loaders[f"{loader.__name__}_stream"] = loader
+        loaders[f"{loader.__name__}_full"] = full_loader(loader, args.data_dir / f"{table}.json", keys)
+    loaders["load_json"] = lambda: Dataset.build(json.loads(path.read_bytes()))
+    loaders["load_snapshot"] = lambda: Dataset.from_snapshot(read_snapshot(snapshot_path(path), path))
+    results = {name: measure(loader, args.repeat) for name, loader in loaders.items()}
+    for name, loader in loaders.items():
+        results[name]["peak_bytes"] = peak_allocation(loader)
+
+    report = {
+        "python": platform.python_version(),
+        "json_bytes": path.stat().st_size,
+        "snapshot_bytes": snapshot_path(path).stat().st_size,
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        _ = args.output.write_text(text, "utf-8")
+    print(text)  # noqa: T201
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print(json.dumps({"regressions": regressions}, indent=2), file=sys.stderr)  # noqa: T201
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+合并数据重建（/更新数据 中下载之后的部分）的基准测试。
+
+用法：
+    python benchmarks/bench_rebuild.py --data-dir <包含五张数据表的目录> [--scale 10] [--repeat 5]
+        [--output result.json] [--baseline baseline.json --tolerance 0.2]
+
+--scale N 会把干员和皮肤复制为 N 份（ID 加后缀区分），用于观察合并耗时随数据量的变化。
+结果以 JSON 输出；指定 --baseline 时，任一项目的中位数比基线慢 tolerance 以上则以非零状态退出。
+"""
+
+import argparse
+import json
+import platform
+import sys
+from pathlib import Path
+
+from common import bootstrap, compare_with_baseline, measure
+
+
+def scale_inputs(character_data: dict, handbook_data: dict, skin_data: dict, factor: int):
+    """
+    把加载后的数据放大 factor 倍，每一份副本的干员 ID 和皮肤 ID 都带有 `#k` 后缀。
+    """
+    if factor <= 1:
+        return character_data, handbook_data, skin_data
+
+    def suffix(value: str, k: int):
+        return value if k == 0 else f"{value}#{k}"
+
+    characters = {
+        suffix(char_id, k): info for k in range(factor) for char_id, info in character_data.items()
+    }
+    handbook = {
+        key: {suffix(char_id, k): info for k in range(factor) for char_id, info in data.items()}
+        for key, data in handbook_data.items()
+    }
+    skins = {
+        suffix(skin_id, k): {**info, "skinId": suffix(skin_id, k), "charId": suffix(info["charId"], k)}
+        for k in range(factor)
+        for skin_id, info in skin_data.items()
+    }
+    return characters, handbook, skins
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    _ = parser.add_argument("--data-dir", type=Path, required=True)
+    _ = parser.add_argument("--scale", type=int, default=1)
+    _ = parser.add_argument("--repeat", type=int, default=5)
+    _ = parser.add_argument("--output", type=Path)
+    _ = parser.add_argument("--baseline", type=Path)
+    _ = parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    bootstrap(args.data_dir)
+
+    from nonebot_plugin_ark_roulette.saveData import (
+        load_character_data,
+        load_handbook_data,
+        load_skin_data,
+        merge_data,
+    )
+
+    character_data = load_character_data()
+    handbook_data = load_handbook_data()
+    skin_data = load_skin_data()
+    scaled = scale_inputs(character_data, handbook_data, skin_data, args.scale)
+
+    results = {
+        "load_character_data": measure(load_character_data, args.repeat),
+        "load_handbook_data": measure(load_handbook_data, args.repeat),
+        "load_skin_data": measure(load_skin_data, args.repeat),
+        f"merge_data_x{args.scale}": measure(lambda: merge_data(*scaled), args.repeat),
+    }
+    report = {
+        "python": platform.python_version(),
+        "scale": args.scale,
+        "operators": len(scaled[0]),
+        "skins": len(scaled[2]),
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        _ = args.output.write_text(text, "utf-8")
+    print(text)  # noqa: T201
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print(json.dumps({"regressions": regressions}, indent=2), file=sys.stderr)  # noqa: T201
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
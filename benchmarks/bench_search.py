@@ -0,0 +1,94 @@
+"""
+全文检索后端的一致性检查与基准测试：比较默认的内存索引与 SQLite FTS5 后端。
+
+用法：
+    python benchmarks/bench_search.py --data-dir <包含 merged_character_data.json 的目录>
+        [--keywords 2000] [--seed 0] [--repeat 5] [--output result.json]
+
+关键词从干员全文中随机截取（1 到 12 个字），另外加入一些包含 JSON 标点和大写字母的关键词。
+任一关键词两个后端的结果不同都会列出并以非零状态退出；一致时输出两个后端的单次查询耗时。
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+from pathlib import Path
+
+from common import bootstrap, measure
+
+EDGE_KEYWORDS = ("", "a", '"', "\\", '": "', "TIER_6", "SNIPER", "], [", "null")
+
+
+def sample_keywords(docs: list[str], count: int, seed: int):
+    """
+    从全文中随机截取 count 个关键词。
+    """
+    rng = random.Random(seed)
+    keywords = set(EDGE_KEYWORDS)
+    while len(keywords) < count:
+        doc = docs[rng.randrange(len(docs))]
+        length = rng.choice((1, 2, 3, 4, 6, 8, 12))
+        start = rng.randrange(max(1, len(doc) - length))
+        keywords.add(doc[start : start + length])
+    return sorted(keywords)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    _ = parser.add_argument("--data-dir", type=Path, required=True)
+    _ = parser.add_argument("--keywords", type=int, default=2000)
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--repeat", type=int, default=5)
+    _ = parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    bootstrap(args.data_dir, search_backend="fts")
+
+    from nonebot_plugin_ark_roulette.dataset import load_dataset
+
+    dataset = load_dataset(args.data_dir / "merged_character_data.json")
+    backend = dataset.search_backend
+    if backend is None:
+        sys.exit("FTS5 检索数据库不可用，请检查日志。")
+
+    keywords = sample_keywords(list(dataset.index.docs), args.keywords, args.seed)
+    mismatches = [
+        keyword for keyword in keywords if backend.search(keyword) != dataset.index.search(keyword)
+    ]
+    if mismatches:
+        print(json.dumps({"mismatches": mismatches[:50]}, ensure_ascii=False, indent=2), file=sys.stderr)  # noqa: T201
+        sys.exit(1)
+
+    def run(search):
+        def loop():
+            for keyword in keywords:
+                _ = search(keyword)
+
+        return loop
+
+    results = {
+        name: measure(run(search), args.repeat)
+        for name, search in (("index", dataset.index.search), ("fts", backend.search))
+    }
+    for result in results.values():
+        result["per_query_us"] = result["median"] / len(keywords) * 1e6
+
+    report = {
+        "python": platform.python_version(),
+        "operators": len(dataset),
+        "keywords": len(keywords),
+        "database_bytes": backend.path.stat().st_size,
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        _ = args.output.write_text(text, "utf-8")
+    print(text)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+离线基准测试套件：在合成数据上测量插件的主要路径，并与保存的基线比较。
+
+用法：
+    python benchmarks/bench_suite.py [--operators 300] [--seed 0] [--data-dir <目录>] [--repeat 5]
+        [--output result.json] [--baseline benchmarks/baseline.json] [--tolerance 0.2] [--update-baseline]
+
+不指定 --data-dir 时用 `synthetic.generate` 在临时目录中生成五张数据表；指定时使用（或生成到）该目录，
+目录中已有数据表时不会覆盖。测量的项目：
+
+- merge_rebuild：解析五张数据表、合并、写出数据文件并构建数据集（/更新数据 中下载之后的部分）
+- cold_start_json / cold_start_snapshot：从数据文件或二进制快照构建数据集
+- build_mappings：构建映射表
+- resolve_keyword：映射表的精确、模糊和未命中查询
+- search_single / search_multi：单关键词和多条件筛选，_cold 为清空条件缓存后的首次筛选，_warm 为缓存命中
+- search_raw_data：逐条序列化数据并匹配的全文扫描，作为索引检索的对照
+- session_create：创建筛选会话
+- random_select：在筛选结果中随机选择干员
+
+结果以 JSON 输出，每项为整批操作耗时（秒）的中位数、最小值和最大值，ops 为每批的操作数。
+基线文件存在时比较中位数，任一项目比基线慢 tolerance 以上则以非零状态退出；
+基线的数据规模（干员数和随机种子）与本次不同时不比较。--update-baseline 把本次结果写为基线。
+仓库中的 baseline.json 在主分支上以 --repeat 11 生成，刷新方法见 README 的“基准测试”一节。
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+
+from common import bootstrap, compare_with_baseline, measure
+from synthetic import generate
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+MAPPING_KEYWORDS = (
+    "狙击",
+    "六星",
+    "速射手",
+    "罗德岛",
+    "高台",
+    "性别",
+    "速射",
+    "罗德",
+    "卡西",
+    "术",
+    "不存在的关键词",
+    "SNIPER",
+)
+
+SINGLE_QUERIES = ("六星", "狙击", "女", "罗德岛", "卡西米尔", "速射手", "身高>170", "生日=12月")
+
+MULTI_QUERIES = (
+    "六星 狙击 女",
+    "职业=术师 稀有度>=5 !男",
+    "(狙击|术师) 身高>170",
+    "罗德岛 近卫 地面",
+    "标签:治疗 !医疗 出身地=卡西米尔",
+    "档案 源石技艺 时代",
+)
+
+RAW_KEYWORDS = ("tier_6", "sniper", "精英化", "卡西米尔")
+
+SESSIONS = 1000
+SELECTIONS = 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    _ = parser.add_argument("--operators", type=int, default=300)
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--data-dir", type=Path)
+    _ = parser.add_argument("--repeat", type=int, default=5)
+    _ = parser.add_argument("--output", type=Path)
+    _ = parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    _ = parser.add_argument("--tolerance", type=float, default=0.2)
+    _ = parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="ark-roulette-bench-") as tmp:
+        data_dir: Path = args.data_dir or Path(tmp)
+        if not (data_dir / "character_table.json").is_file():
+            _ = generate(data_dir, args.operators, args.seed)
+        report = run(data_dir, args.repeat)
+    report["operators"] = args.operators
+    report["seed"] = args.seed
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        _ = args.output.write_text(text, "utf-8")
+    print(text)  # noqa: T201
+
+    if args.update_baseline:
+        _ = args.baseline.write_text(text, "utf-8")
+        return
+    if not args.baseline.is_file():
+        return
+    baseline = json.loads(args.baseline.read_text("utf-8"))
+    if (baseline.get("operators"), baseline.get("seed")) != (args.operators, args.seed):
+        print("基线的数据规模与本次不同，跳过比较。", file=sys.stderr)  # noqa: T201
+        return
+    regressions = compare_with_baseline(report["results"], args.baseline, args.tolerance)
+    if regressions:
+        print(json.dumps({"regressions": regressions}, indent=2), file=sys.stderr)  # noqa: T201
+        sys.exit(1)
+
+
+def run(data_dir: Path, repeat: int):
+    """
+    在 data_dir 的数据表上运行所有项目，返回报告。
+    """
+    bootstrap(data_dir)
+
+    from nonebot_plugin_ark_roulette.dataset import Dataset, store_dataset
+    from nonebot_plugin_ark_roulette.index import iter_bits
+    from nonebot_plugin_ark_roulette.mapping import mapping_registry, resolve_keyword, search_raw_data
+    from nonebot_plugin_ark_roulette.query import compile_query, evaluate
+    from nonebot_plugin_ark_roulette.saveData import process_data, save_to_json
+    from nonebot_plugin_ark_roulette.session import FilterSession, SessionManager
+    from nonebot_plugin_ark_roulette.snapshot import read_snapshot, snapshot_path
+
+    path = data_dir / "merged_character_data.json"
+
+    def rebuild():
+        merged = process_data()
+        save_to_json(merged, path)
+        return store_dataset(path, merged)
+
+    dataset = rebuild()
+    merged = json.loads(path.read_bytes())
+    full = dataset.full_mask
+
+    def resolve():
+        for keyword in MAPPING_KEYWORDS:
+            _ = resolve_keyword(keyword)
+
+    def search(queries: tuple[str, ...], cold: bool):
+        nodes = [compile_query(query) for query in queries]
+
+        def loop():
+            if cold:
+                dataset._term_cache.clear()  # pyright: ignore[reportPrivateUsage]
+                dataset._field_values.clear()  # pyright: ignore[reportPrivateUsage]
+            for node in nodes:
+                _ = full & evaluate(node, dataset)
+
+        return loop
+
+    def raw_search():
+        for keyword in RAW_KEYWORDS:
+            _ = search_raw_data(merged, keyword)
+
+    def create_sessions():
+        async def create():
+            manager = SessionManager(ttl=120.0, max_sessions=SESSIONS)
+            for i in range(SESSIONS):
+                _ = manager.start(f"user{i}", FilterSession.start(dataset))
+            manager.close()
+
+        asyncio.run(create())
+
+    pool = list(iter_bits(evaluate(compile_query("狙击"), dataset)))
+    rng = random.Random(0)
+
+    def select():
+        for _ in range(SELECTIONS):
+            _ = [dataset.names[i] for i in rng.sample(pool, min(5, len(pool)))]
+
+    benchmarks: dict[str, tuple[Callable[[], object], int]] = {
+        "merge_rebuild": (rebuild, 1),
+        "cold_start_json": (lambda: Dataset.build(json.loads(path.read_bytes())), 1),
+        "cold_start_snapshot": (lambda: Dataset.from_snapshot(read_snapshot(snapshot_path(path), path)), 1),
+        "build_mappings": (mapping_registry.build, 1),
+        "resolve_keyword": (resolve, len(MAPPING_KEYWORDS)),
+        "search_single_cold": (search(SINGLE_QUERIES, cold=True), len(SINGLE_QUERIES)),
+        "search_single_warm": (search(SINGLE_QUERIES, cold=False), len(SINGLE_QUERIES)),
+        "search_multi_cold": (search(MULTI_QUERIES, cold=True), len(MULTI_QUERIES)),
+        "search_multi_warm": (search(MULTI_QUERIES, cold=False), len(MULTI_QUERIES)),
+        "search_raw_data": (raw_search, len(RAW_KEYWORDS)),
+        "session_create": (create_sessions, SESSIONS),
+        "random_select": (select, SELECTIONS),
+    }
+    results: dict[str, dict[str, float]] = {}
+    for name, (func, ops) in benchmarks.items():
+        results[name] = {**measure(func, repeat), "ops": ops}
+
+    return {
+        "python": platform.python_version(),
+        "dataset_operators": len(dataset),
+        "table_bytes": {
+            table.stem: table.stat().st_size for table in sorted(data_dir.glob("*_table.json"))
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    main()
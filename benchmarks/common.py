@@ -0,0 +1,73 @@
+"""
+基准测试的公共工具：初始化 NoneBot 并加载插件、计时与结果输出。
+
+插件模块在导入时依赖 NoneBot 与 localstore，因此所有基准测试都需要先调用 `bootstrap`
+指定数据目录，再导入插件的子模块。
+"""
+
+import gc
+import json
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import nonebot
+
+PLUGIN_NAME = "nonebot_plugin_ark_roulette"
+
+
+def bootstrap(data_dir: Path, **config: Any):
+    """
+    以不带驱动器的方式初始化 NoneBot，并把插件数据目录指向 data_dir。
+    """
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+    nonebot.init(
+        driver="~none",
+        localstore_plugin_data_dir={PLUGIN_NAME: str(data_dir)},
+        update_on_launch=False,
+        log_level="WARNING",
+        **config,
+    )
+    _ = nonebot.load_plugin(PLUGIN_NAME)
+
+
+def measure(func: Callable[[], object], repeat: int = 5, warmup: int = 1):
+    """
+    多次运行 func，返回耗时（秒）的中位数、最小值和最大值。
+    """
+    for _ in range(warmup):
+        _ = func()
+    samples: list[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        _ = func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "repeat": repeat,
+    }
+
+
+def compare_with_baseline(results: dict[str, dict[str, float]], baseline_path: Path, tolerance: float):
+    """
+    与基线结果比较中位数，返回慢于基线超过 tolerance 比例的项目。
+    """
+    baseline = json.loads(baseline_path.read_text("utf-8"))["results"]
+    regressions: dict[str, dict[str, float]] = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median"] / baseline[name]["median"]
+        if ratio > 1 + tolerance:
+            regressions[name] = {
+                "baseline": baseline[name]["median"],
+                "current": result["median"],
+                "ratio": ratio,
+            }
+    return regressions
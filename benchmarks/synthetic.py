@@ -0,0 +1,431 @@
+"""
+生成结构与游戏数据一致的合成数据表，供基准测试离线使用。
+
+生成 character_table、skin_table、handbook_info_table、uniequip_table 和 handbook_team_table 五张表，
+字段、嵌套结构和取值形式参照 ArknightsGameData 的中文数据，包括插件不读取的字段（技能、精英化、
+模组等），使流式字段投影和完整解析的对比与真实数据相近。角色表中还包含召唤物和装置，
+约一成的干员为机械单位，基础档案使用制造商、产地、出厂日等字段。相同的参数和随机种子生成的内容相同。
+
+用法：
+    python benchmarks/synthetic.py <输出目录> [--operators 300] [--seed 0]
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+from typing import Any
+
+PROFESSIONS = ("PIONEER", "WARRIOR", "SNIPER", "CASTER", "MEDIC", "SUPPORT", "TANK", "SPECIAL")
+
+SUB_PROFESSIONS = {
+    "PIONEER": ("尖兵", "冲锋手", "战术家", "执旗手", "情报官", "策士"),
+    "WARRIOR": ("无畏者", "教官", "剑豪", "术战者", "领主", "强攻手", "斗士", "重剑手", "收割者"),
+    "SNIPER": ("速射手", "神射手", "重射手", "炮手", "散射手", "投掷手", "攻城手", "回环射手"),
+    "CASTER": ("中坚术师", "扩散术师", "链术师", "秘术师", "阵法术师", "驭械术师", "轰击术师"),
+    "MEDIC": ("医师", "群愈师", "疗养师", "行医", "咒愈师", "链愈师"),
+    "SUPPORT": ("削弱者", "凝滞师", "召唤师", "吟游者", "护佑者", "工匠", "巫役"),
+    "TANK": ("重盾卫士", "守护者", "不屈者", "决战者", "驭法铁卫", "哨戒铁卫", "要塞"),
+    "SPECIAL": ("处决者", "推击手", "钩索师", "伏击客", "傀儡师", "怪杰", "行商", "巡空者"),
+}
+
+NATIONS = (
+    ("rhodes", "罗德岛"),
+    ("kazimierz", "卡西米尔"),
+    ("laterano", "拉特兰"),
+    ("lungmen", "龙门"),
+    ("victoria", "维多利亚"),
+    ("ursus", "乌萨斯"),
+    ("yan", "炎"),
+    ("siracusa", "叙拉古"),
+    ("columbia", "哥伦比亚"),
+    ("kjerag", "谢拉格"),
+    ("iberia", "伊比利亚"),
+    ("sargon", "萨尔贡"),
+    ("leithanien", "莱塔尼亚"),
+    ("minos", "米诺斯"),
+    ("sami", "萨米"),
+    ("egir", "阿戈尔"),
+)
+
+GROUPS = (
+    ("penguin", "企鹅物流"),
+    ("blacksteel", "黑钢国际"),
+    ("karlan", "喀兰贸易"),
+    ("rainbow", "彩虹小队"),
+    ("lgd", "近卫局"),
+    ("glasgow", "格拉斯哥帮"),
+    ("abyssal", "深海猎人"),
+    ("sui", "岁"),
+)
+
+TEAMS = (("action4", "行动预备组A4"), ("reserve1", "预备行动组A1"), ("reserve4", "预备行动组A4"))
+
+TAGS = (
+    "输出",
+    "生存",
+    "治疗",
+    "支援",
+    "控场",
+    "削弱",
+    "位移",
+    "爆发",
+    "费用回复",
+    "快速复活",
+    "召唤",
+    "防护",
+)
+
+OBTAIN_APPROACHES = ("招募寻访", "主线剧情", "活动获得", "信用交易所", "凭证交易所", None)
+
+RACES = ("黎博利", "菲林", "沃尔珀", "萨卡兹", "鲁珀", "阿达克利斯", "瓦伊凡", "卡特斯", "龙", "未公开")
+
+EXPERIENCES = ("没有战斗经验", "一年", "两年", "三年", "五年", "六年", "十二年", "十余年", "不明")
+
+SKIN_GROUPS = (
+    ("ILLUST_0", "默认服装"),
+    ("ILLUST_1", "默认服装"),
+    ("ILLUST_2", "精英化"),
+    ("ila", "时代"),
+    ("ghost", "至纯源石"),
+    ("rhodes", "罗德岛制药"),
+    ("epoque", "EPOQUE"),
+    ("marthe", "MARTHE"),
+    ("coral", "珊瑚海岸"),
+)
+
+TEXT = (
+    "罗德岛的干员在源石技艺方面表现出稳定的适应性，在行动中能够冷静地执行指挥的部署，"
+    "于近期的数次外勤任务中多次承担关键岗位。根据该干员的个人意愿，其档案中的部分经历未予公开。"
+)
+
+
+def _story(text: str):
+    return {
+        "storyText": text,
+        "unLockType": "DIRECT",
+        "unLockParam": "",
+        "unLockString": "",
+        "patchIdList": None,
+    }
+
+
+def _section(title: str, text: str):
+    return {"storyTitle": title, "unLockorNot": True, "stories": [_story(text)]}
+
+
+def _phases(rng: random.Random, count: int):
+    """
+    精英化阶段数据，体积较大但插件不读取。
+    """
+    return [
+        {
+            "characterPrefabKey": f"prefab_{phase}",
+            "rangeId": f"{rng.randint(0, 3)}-{rng.randint(1, 3)}",
+            "maxLevel": (50, 70, 90)[phase],
+            "attributesKeyFrames": [
+                {
+                    "level": level,
+                    "data": {
+                        "maxHp": rng.randint(500, 4000),
+                        "atk": rng.randint(100, 1200),
+                        "def": rng.randint(0, 800),
+                        "magicResistance": rng.choice((0.0, 10.0, 15.0, 20.0)),
+                        "cost": rng.randint(5, 30),
+                        "blockCnt": rng.randint(0, 3),
+                        "moveSpeed": 1.0,
+                        "attackSpeed": 100.0,
+                        "baseAttackTime": rng.choice((1.0, 1.2, 1.6, 2.85)),
+                        "respawnTime": rng.choice((18, 35, 70, 80)),
+                    },
+                }
+                for level in (1, (50, 70, 90)[phase])
+            ],
+            "evolveCost": [{"id": "3211", "count": rng.randint(1, 20), "type": "MATERIAL"}]
+            if phase
+            else None,
+        }
+        for phase in range(count)
+    ]
+
+
+def _skills(rng: random.Random, char_id: str, count: int):
+    return [
+        {
+            "skillId": f"skchr_{char_id.split('_', 2)[-1]}_{i + 1}",
+            "overridePrefabKey": None,
+            "overrideTokenKey": None,
+            "levelUpCostCond": [
+                {
+                    "unlockCond": {"phase": "PHASE_2", "level": 1},
+                    "lvlUpTime": 28800 * (level + 1),
+                    "levelUpCost": [{"id": "3303", "count": rng.randint(1, 10), "type": "MATERIAL"}],
+                }
+                for level in range(3)
+            ],
+            "unlockCond": {"phase": f"PHASE_{i}", "level": 1},
+        }
+        for i in range(count)
+    ]
+
+
+def _archives(rng: random.Random, name: str, robot: bool, birthplaces: list[str]):
+    """
+    返回基础档案、综合体检测试等档案章节。
+    """
+    if robot:
+        basic = (
+            f"【型号】{name}\n【制造商】{rng.choice(birthplaces)}工业\n【产地】{rng.choice(birthplaces)}\n"
+            f"【出厂日】{rng.randint(1, 12)}月{rng.randint(1, 28)}日\n"
+            f"【高度】{rng.randint(40, 250)}cm\n【重量】{rng.randint(20, 400)}kg\n"
+            "【维护检测报告】\n经检测，该干员为机械单位，不存在矿石病感染的可能性。"
+        )
+        physical = "【机动性】标准\n【防护等级】普通\n【运算能力】优良\n【设计寿命】未公开"
+    else:
+        infected = rng.random() < 0.4
+        basic = (
+            f"【代号】{name}\n【性别】{rng.choice(('男', '女', '女', '未公开'))}\n"
+            f"【战斗经验】{rng.choice(EXPERIENCES)}\n【出身地】{rng.choice(birthplaces)}\n"
+            f"【生日】{rng.randint(1, 12)}月{rng.randint(1, 28)}日\n【种族】{rng.choice(RACES)}\n"
+            f"【身高】{rng.randint(140, 200)}cm\n【矿石病感染情况】\n"
+            + (
+                "体表有源石结晶分布，参照医学检测报告，确认为感染者。"
+                if infected
+                else "参照医学检测报告，确认为非感染者。"
+            )
+        )
+        physical = "\n".join(
+            f"【{field}】{rng.choice(('普通', '标准', '优良', '卓越', '缺陷'))}"
+            for field in ("物理强度", "战场机动", "生理耐受", "战术规划", "战斗技巧", "源石技艺适应性")
+        )
+    sections = [
+        _section("基础档案", basic),
+        _section("综合体检测试", physical),
+        _section("客观履历", TEXT * rng.randint(1, 3)),
+        _section("临床诊断分析", TEXT * rng.randint(2, 4)),
+    ]
+    sections += [_section(f"档案资料{n}", TEXT * rng.randint(2, 6)) for n in ("一", "二", "三", "四")]
+    sections.append(_section("晋升记录", TEXT))
+    return sections
+
+
+def _skin(rng: random.Random, skin_id: str, char_id: str, name: str, group: tuple[str, str], sort_id: int):
+    group_id, group_name = group
+    default = group_id.startswith("ILLUST")
+    return {
+        "skinId": skin_id,
+        "charId": char_id,
+        "tokenSkinMap": None,
+        "illustId": f"illust_{skin_id}",
+        "dynIllustId": None,
+        "avatarId": skin_id,
+        "portraitId": skin_id,
+        "dynPortraitId": None,
+        "dynEntranceId": None,
+        "buildingId": None,
+        "battleSkin": {"overwritePrefab": not default, "skinOrPrefabId": None if default else skin_id},
+        "isBuySkin": not default,
+        "tmplId": None,
+        "voiceId": None,
+        "voiceType": "NONE",
+        "displaySkin": {
+            "skinName": None if default else f"{name}·{rng.choice(('夏日', '夜行', '礼装', '旅途'))}",
+            "colorList": ["#ffffff", "#000000"],
+            "titleList": [group_name],
+            "modelName": name,
+            "drawerList": [f"画师{rng.randint(1, 80)}"],
+            "designerList": None if default else [f"设计师{rng.randint(1, 20)}"],
+            "skinGroupId": group_id,
+            "skinGroupName": group_name,
+            "skinGroupSortIndex": sort_id,
+            "content": "" if default else TEXT,
+            "dialog": None if default else TEXT[:40],
+            "usage": None if default else "用于日常工作与外勤任务。",
+            "description": None if default else TEXT[:60],
+            "obtainApproach": None if default else "采购中心",
+            "sortId": sort_id,
+            "displayTagId": None,
+            "getTime": 1556668800 + sort_id * 86400,
+            "onYear": 0,
+            "onPeriod": 0,
+        },
+    }
+
+
+def generate(out_dir: Path, operators: int = 300, seed: int = 0):
+    """
+    在 out_dir 中生成五张数据表，返回各表的文件大小（字节）。
+    """
+    rng = random.Random(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    sub_prof_dict: dict[str, dict[str, Any]] = {}
+    subs_by_profession: dict[str, list[str]] = {}
+    for category, (profession, names) in enumerate(SUB_PROFESSIONS.items()):
+        for i, name in enumerate(names):
+            sub_id = f"{profession.lower()}{i}"
+            sub_prof_dict[sub_id] = {
+                "subProfessionId": sub_id,
+                "subProfessionName": name,
+                "subProfessionCatagory": category,
+            }
+            subs_by_profession.setdefault(profession, []).append(sub_id)
+
+    teams: dict[str, dict[str, Any]] = {}
+    for level, entries in enumerate((NATIONS, GROUPS, TEAMS)):
+        for order, (power_id, name) in enumerate(entries):
+            teams[power_id] = {
+                "powerId": power_id,
+                "orderNum": order,
+                "powerLevel": level,
+                "powerName": name,
+                "powerCode": name,
+                "color": f"#{rng.randrange(0x1000000):06x}",
+                "isLimited": False,
+                "isRaw": level == 0,
+            }
+    birthplaces = [name for _, name in NATIONS] + ["未公开", "东国", "雷姆必拓"]
+
+    characters: dict[str, dict[str, Any]] = {}
+    skins: dict[str, dict[str, Any]] = {}
+    handbook: dict[str, dict[str, Any]] = {}
+    sort_id = 0
+    for i in range(operators):
+        char_id = f"char_{100 + i}_op{i:04d}"
+        name = f"干员{i:04d}"
+        rarity = rng.choices(range(6), weights=(3, 3, 8, 14, 12, 8))[0]
+        profession = rng.choice(PROFESSIONS)
+        robot = rng.random() < 0.1
+        melee_only = profession in ("PIONEER", "WARRIOR", "TANK")
+        elite = 0 if rarity < 2 else 1 if rarity < 3 else 2
+        nation = rng.choice(NATIONS)[0] if rng.random() < 0.9 else None
+        group = rng.choice(GROUPS)[0] if rng.random() < 0.3 else None
+        characters[char_id] = {
+            "name": name,
+            "description": f"攻击造成<@ba.kw>{rng.randint(110, 200)}%</>的伤害",
+            "canUseGeneralPotentialItem": True,
+            "canUseActivityPotentialItem": False,
+            "potentialItemId": f"p_{char_id}",
+            "activityPotentialItemId": None,
+            "classicPotentialItemId": None,
+            "nationId": nation,
+            "groupId": group,
+            "teamId": rng.choice(TEAMS)[0] if rng.random() < 0.05 else None,
+            "displayNumber": f"{rng.choice('ABCRSTV')}{rng.randint(1, 999):03d}",
+            "appellation": f"Operator{i:04d}",
+            "position": "MELEE" if melee_only else rng.choice(("RANGED", "MELEE")),
+            "tagList": rng.sample(TAGS, rng.randint(1, 3)),
+            "itemUsage": f"罗德岛{name}，{TEXT[:30]}",
+            "itemDesc": TEXT[30:80],
+            "itemObtainApproach": rng.choice(OBTAIN_APPROACHES),
+            "isNotObtainable": False,
+            "isSpChar": False,
+            "maxPotentialLevel": 5,
+            "rarity": f"TIER_{rarity + 1}",
+            "profession": profession,
+            "subProfessionId": rng.choice(subs_by_profession[profession]),
+            "trait": None,
+            "phases": _phases(rng, elite + 1),
+            "skills": _skills(rng, char_id, elite + (rarity == 5)),
+            "displayTokenDict": None,
+            "talents": [{"candidates": [{"name": f"天赋{t}", "description": TEXT[:50]}]} for t in range(2)],
+            "potentialRanks": [{"type": "BUFF", "description": "部署费用-1"} for _ in range(5)],
+            "favorKeyFrames": [{"level": 0, "data": {"atk": 0}}, {"level": 50, "data": {"atk": 40}}],
+            "allSkillLvlup": [{"unlockCond": {"phase": "PHASE_0", "level": 1}, "lvlUpCost": None}],
+        }
+        skin_groups = [SKIN_GROUPS[1]] + ([SKIN_GROUPS[2]] if elite == 2 else [])
+        skin_groups += rng.sample(SKIN_GROUPS[3:], rng.randint(0, 2))
+        for j, group_info in enumerate(skin_groups):
+            group_id = group_info[0]
+            # 默认服装和精英化立绘为 char_xxx#1、#2，其余皮肤为 char_xxx@系列#序号
+            if group_id.startswith("ILLUST"):
+                skin_id = f"{char_id}#{group_id[-1]}"
+            else:
+                skin_id = f"{char_id}@{group_id}#{j}"
+            skins[skin_id] = _skin(rng, skin_id, char_id, name, group_info, sort_id)
+            sort_id += 1
+        handbook[char_id] = {
+            "charID": char_id,
+            "infoName": name,
+            "isLimited": False,
+            "storyTextAudio": _archives(rng, name, robot, birthplaces),
+            "handbookAvgList": [],
+        }
+
+    # 召唤物和装置在角色表中，但没有档案
+    for i in range(max(1, operators // 8)):
+        kind = "token" if i % 2 else "trap"
+        char_id = f"{kind}_{10000 + i}_{kind}{i}"
+        characters[char_id] = {
+            "name": f"{'召唤物' if kind == 'token' else '装置'}{i}",
+            "description": None,
+            "nationId": None,
+            "groupId": None,
+            "teamId": None,
+            "displayNumber": None,
+            "appellation": " ",
+            "position": rng.choice(("MELEE", "RANGED", "ALL")),
+            "tagList": None,
+            "itemObtainApproach": None,
+            "rarity": "TIER_1",
+            "profession": "TOKEN" if kind == "token" else "TRAP",
+            "subProfessionId": "notchar1" if kind == "token" else "notchar2",
+            "phases": _phases(rng, 1),
+            "skills": [],
+        }
+
+    tables = {
+        "character_table": characters,
+        "skin_table": {
+            "charSkins": skins,
+            "buildinEvolveMap": {char_id: {"0": char_id} for char_id in list(handbook)[:50]},
+            "buildinPatchMap": {},
+            "brandList": {},
+            "specialSkinInfoList": [],
+        },
+        "handbook_info_table": {
+            "handbookDict": handbook,
+            "npcDict": {
+                f"npc_{i:03d}": {"npcId": f"npc_{i:03d}", "name": f"角色{i}", "resType": "SPINE"}
+                for i in range(operators // 4)
+            },
+            "teamMissionList": {},
+            "handbookDisplayConditionList": {},
+            "handbookStageData": {},
+            "handbookStageTime": [],
+        },
+        "uniequip_table": {
+            "equipDict": {
+                f"uniequip_002_{char_id}": {"uniEquipId": f"uniequip_002_{char_id}", "charId": char_id}
+                for char_id in list(handbook)[: operators // 2]
+            },
+            "missionList": {},
+            "subProfDict": sub_prof_dict,
+            "charEquip": {},
+            "equipTrackDict": [],
+        },
+        "handbook_team_table": teams,
+    }
+    sizes: dict[str, int] = {}
+    for name, table in tables.items():
+        path = out_dir / f"{name}.json"
+        # 与游戏数据仓库相同，使用四个空格缩进
+        _ = path.write_text(json.dumps(table, ensure_ascii=False, indent=4), "utf-8")
+        sizes[name] = path.stat().st_size
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    _ = parser.add_argument("out_dir", type=Path)
+    _ = parser.add_argument("--operators", type=int, default=300)
+    _ = parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sizes = generate(args.out_dir, args.operators, args.seed)
+    print(json.dumps(sizes, indent=2))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,15 @@
 # pyright: reportUnknownMemberType=none
 
 import asyncio
-import json
-import os
+import functools
+import random
+from collections.abc import Awaitable
 from typing import Any
 
 from nonebot import get_driver, logger, on_command, require
-from nonebot.adapters import Event, Message
+from nonebot.adapters import Bot, Event, Message
 
 # from nonebot.adapters.onebot.v11 import Message, MessageEvent
-from nonebot.exception import FinishedException
 from nonebot.params import CommandArg
 from nonebot.permission import SUPERUSER
 from nonebot.plugin import PluginMetadata, get_plugin_config
@@ -20,11 +20,18 @@ from nonebot_plugin_localstore import get_plugin_data_dir
 
 DATA_DIR = get_plugin_data_dir()
 
-from .ArkSrc import check_resource_exists, fetch_and_save_data_async
+from .ArkSrc import check_resource_exists
+from .cache import ResultCache, SingleFlight
 from .config import Config
-from .mapping import map_tables, search_raw_data
-from .saveData import load_character_data, load_handbook_data, load_skin_data, merge_data, save_to_json
-from .schemas import MergedMapping
+from .dataset import datasets, load_dataset
+from .index import check_parity, iter_bits
+from .mapping import mapping_registry
+from .metrics import metrics
+from .pipeline import pipeline
+from .profiler import capture_details, describe_capture, profiler
+from .query import QuerySyntaxError, TextTerm, canonical, compile_query, conjuncts
+from .session import FilterSession, SessionManager, SessionNotReady
+from .session_store import SqliteSessionStore
 
 __plugin_meta__ = PluginMetadata(
     name="明日方舟干员插件",
@@ -47,84 +54,153 @@ merged_character_data_path = DATA_DIR / "merged_character_data.json"
 find_operator = on_command("筛选", aliases={"筛选干员"}, priority=5, block=True)
 random_operator = on_command("随机选择", aliases={"随机干员", "roll"}, priority=5, block=True)
 update_data = on_command("更新数据", aliases={"更新干员数据"}, priority=5, block=True, permission=SUPERUSER)
+plugin_status = on_command("插件状态", priority=5, block=True, permission=SUPERUSER)
+profile_report = on_command("性能分析", priority=5, block=True, permission=SUPERUSER)
+
+sessions = SessionManager(
+    conf.session_ttl,
+    conf.max_sessions,
+    SqliteSessionStore(DATA_DIR / "sessions.sqlite3") if conf.session_store == "sqlite" else None,
+    conf.session_flush_interval,
+    # 恢复存储中的会话时等待数据集就绪，acquire_dataset 在下面定义
+    lambda: acquire_dataset(),
+)
+
+
+result_cache = ResultCache(conf.result_cache_size)
+
+# 相同的并发请求（同一数据集上的相同筛选、同时加载数据）只计算一次
+flights = SingleFlight()
+
+metrics.gauge("dataset_version", lambda: datasets.version)
+metrics.gauge("dataset_operators", lambda: len(dataset) if (dataset := datasets.current) else None)
+metrics.gauge("dataset_live_versions", lambda: len(datasets.live_versions()))
+metrics.collector("sessions", sessions.stats)
+metrics.collector("result_cache", result_cache.stats)
+metrics.collector("flights", flights.stats)
+metrics.collector("mappings", mapping_registry.stats)
 
-find_operator_sessions: dict[str, dict[str, MergedMapping]] = {}
-find_operator_histories: dict[str, list[dict[str, MergedMapping]]] = {}
-SESSION_TIMEOUT = 120
-session_timeout_tasks = {}
+background_tasks: set[asyncio.Task[Any]] = set()
+metrics_task: asyncio.Task[None] | None = None
 
 
-def reset_session_timeout(user_id: str):
-    if user_id in session_timeout_tasks:
-        session_timeout_tasks[user_id].cancel()
+def run_in_background(coro: Awaitable[object]):
+    """
+    在后台运行协程并保留任务引用，出错时记录日志。
+    """
 
-    async def session_timeout():
+    async def runner():
         try:
-            await asyncio.sleep(SESSION_TIMEOUT)
-            logger.info(f"用户 {user_id} 的筛选会话超时，自动退出筛选模式。")
-            _ = find_operator_sessions.pop(user_id, None)
-            _ = find_operator_histories.pop(user_id, None)
-            session_timeout_tasks.pop(user_id, None)
-            await find_operator.finish("由于长时间未操作，已自动退出筛选模式。")
-        except FinishedException:
-            pass
+            await coro
+        except Exception:
+            logger.exception("更新数据时发生错误：")
+
+    task = asyncio.create_task(runner())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+@metrics.timed()
+async def acquire_dataset():
+    """
+    获取用于筛选的数据集。数据更新期间继续使用已加载的数据集；尚无数据时等待数据就绪，
+    最多等待 `ready_timeout` 秒，超时或数据不存在时返回 None。
+    """
+    if pipeline.running:
+        if (dataset := datasets.current) is not None:
+            return dataset
+        if not merged_character_data_path.is_file():
+            try:
+                async with asyncio.timeout(conf.ready_timeout):
+                    await pipeline.wait_ready()
+            except TimeoutError:
+                metrics.count("ready_timeouts")
+                return None
+    if not merged_character_data_path.is_file():
+        return None
+    return await flights.run(
+        ("load", merged_character_data_path),
+        lambda: asyncio.to_thread(load_dataset, merged_character_data_path),
+    )
+
 
-    session_timeout_tasks[user_id] = asyncio.create_task(session_timeout())
+@driver.on_startup
+async def start_metrics_dump():
+    global metrics_task
+    if metrics.enabled and conf.metrics_dump_interval > 0:
+        metrics_task = asyncio.create_task(metrics.dump_periodically(conf.metrics_dump_interval))
 
 
 @driver.on_startup
 async def auto_update_data():
+    # 更新在后台进行，不阻塞启动；期间的命令等待数据就绪或使用旧数据
+    if not conf.update_on_launch or (check_resource_exists() and merged_character_data_path.is_file()):
+        logger.info("干员数据已存在，跳过自动下载数据。如有需要请使用命令触发。")
+        run_in_background(pipeline.warm_up())
+        return
+    logger.info("开始更新干员数据...")
+    run_in_background(pipeline.run())
+
+
+@driver.on_shutdown
+async def stop_sessions():
+    sessions.close()
+
+
+@driver.on_shutdown
+async def stop_metrics_dump():
+    if metrics_task is None:
+        return
+    _ = metrics_task.cancel()
     try:
-        if not conf.update_on_launch or (check_resource_exists() and merged_character_data_path.is_file()):
-            logger.info("干员数据已存在，跳过自动下载数据。如有需要请使用命令触发。")
-            return
-        logger.info("开始更新干员数据...")
-        _ = await fetch_and_save_data_async()
-        merged_data = merge_data(
-            load_character_data(),
-            load_handbook_data(),
-            load_skin_data(),
-        )
-        save_to_json(merged_data, merged_character_data_path)
-        logger.info("干员数据更新完成！")
-    except Exception:
-        logger.exception("更新数据时发生错误：")
+        await asyncio.to_thread(metrics.dump)
+    except OSError:
+        logger.exception("写出性能指标失败：")
 
 
 @update_data.handle()
 async def handle_update_data():
+    if pipeline.running:
+        await update_data.finish(f"干员数据正在更新中，{pipeline.describe()}")
     try:
         logger.info("开始更新干员数据...")
         await update_data.send("正在更新干员数据，请稍等...")
-        _ = await fetch_and_save_data_async()
-        merged_data = merge_data(
-            load_character_data(),
-            load_handbook_data(),
-            load_skin_data(),
-        )
-        save_to_json(merged_data, merged_character_data_path)
-        logger.info("干员数据更新完成！")
-        await update_data.send("干员数据更新完成！")
+        report = await pipeline.run()
     except Exception:
         logger.exception("更新数据时发生错误：")
+        metrics.count("update_failures")
         await update_data.send("更新数据失败，请检查日志。")
+    else:
+        summary = report.summary() if report is not None else ""
+        timings = pipeline.status.timings() if pipeline.status is not None else ""
+        logger.info(f"干员数据更新完成！{summary}")
+        await update_data.send(f"干员数据更新完成！{summary}\n{timings}".strip())
 
 
 @find_operator.handle()
-async def handle_find_operator(event: Event, args: Message[Any] = CommandArg()):
+@metrics.timed("find_operator")
+@profiler.profiled("find_operator")
+async def handle_find_operator(bot: Bot, event: Event, args: Message[Any] = CommandArg()):
+    metrics.count("find_requests")
     user_id = event.get_user_id()
-
-    if not os.path.exists(merged_character_data_path):
-        await find_operator.finish("资源文件不存在，请使用 /更新数据 命令获取最新的干员数据后再尝试。")
-
-    if user_id not in find_operator_sessions:
-        with open(merged_character_data_path, encoding="utf-8") as f:  # noqa: ASYNC230
-            find_operator_sessions[user_id] = json.load(f)
-        find_operator_histories[user_id] = []
-
-    current_data = find_operator_sessions[user_id]
     keywords = args.extract_plain_text().strip()
 
+    try:
+        session = await sessions.fetch(user_id)
+    except SessionNotReady:
+        await find_operator.finish(f"干员数据正在准备中，请稍后再试。{pipeline.describe()}")
+    if session is None or keywords.lower() == "r":
+        dataset = await acquire_dataset()
+        if dataset is None:
+            if pipeline.running:
+                await find_operator.finish(f"干员数据正在准备中，请稍后再试。{pipeline.describe()}")
+            await find_operator.finish("资源文件不存在，请使用 /更新数据 命令获取最新的干员数据后再尝试。")
+        if session is None:
+            session = sessions.start(user_id, FilterSession.start(dataset))
+        elif sessions.get(user_id) is not session:
+            # 等待数据期间会话可能已被淘汰
+            await find_operator.finish("筛选会话已失效，请重新输入筛选条件。")
+
     if not keywords:
         await find_operator.finish(
             "【筛选干员命令说明】\n"
@@ -132,56 +208,97 @@ async def handle_find_operator(event: Event, args: Message[Any] = CommandArg()):
             "/筛选 <关键词1> <关键词2> ...\n"
             "支持的功能：\n"
             "1. 输入多个关键词用空格分隔，例如：/筛选 六星 狙击 男\n"
+            "   也可以限定字段，例如：/筛选 职业=狙击 稀有度>=5 子职业:速射手 性别=女\n"
+            "   身高、生日、战斗经验可以比较大小，例如：/筛选 身高>170 生日=12月\n"
+            "   用 | 表示或、! 表示非、括号分组，例如：/筛选 (狙击|术师) !男\n"
             "2. 输入 'r' 重置筛选结果。\n"
             "3. 输入 'd' 撤销上一个关键词筛选。\n"
             "4. 输入 'q' 退出筛选模式。\n"
-            "如果 120 秒内没有操作，系统将自动退出筛选模式。"
+            f"如果 {conf.session_ttl:g} 秒内没有操作，系统将自动退出筛选模式。"
         )
 
-    reset_session_timeout(user_id)
+    sessions.touch(user_id, functools.partial(bot.send, event))
 
     if keywords.lower() == "q":
-        _ = find_operator_sessions.pop(user_id, None)
-        _ = find_operator_histories.pop(user_id, None)
-        session_timeout_tasks.pop(user_id, None).cancel()
+        _ = sessions.pop(user_id)
         await find_operator.finish("已退出筛选模式。")
     elif keywords.lower() == "r":
-        with open(merged_character_data_path, encoding="utf-8") as f:  # noqa: ASYNC230
-            find_operator_sessions[user_id] = json.load(f)
-        find_operator_histories[user_id] = []
+        session.reset(dataset)
         await find_operator.finish("搜索结果已重置为完整数据集。")
     elif keywords.lower() == "d":
-        if find_operator_histories[user_id]:
-            find_operator_sessions[user_id] = find_operator_histories[user_id].pop()
+        if session.undo():
             await find_operator.finish("已撤销上一个关键词筛选。")
         else:
             await find_operator.finish("没有可以撤销的筛选操作。")
 
     keyword_list = keywords.split()
-    find_operator_histories[user_id].append(current_data.copy())
+    dataset = session.dataset
+    profiler.annotate(query=keywords, dataset_version=dataset.version, candidates=len(session))
+    current_mask = session.mask
 
-    for keyword in keyword_list:
-        keyword = map_tables(keyword)
-        results = search_raw_data(current_data, keyword)
-        if results:
-            current_data = {key: value for result in results for key, value in result.items()}
-        else:
-            await find_operator.finish(f"没有找到包含关键词 '{' '.join(keyword_list)}' 的条目。")
-
-    find_operator_sessions[user_id] = current_data
-    names: list[str] = [value.get("name", "N/A") for _, value in current_data.items()]
-    result_text = (
-        f"找到 {len(current_data)} 个包含关键词 '{' '.join(keyword_list)}' 的条目：\n" + "，".join(names)
+    try:
+        query = compile_query(keywords)
+    except QuerySyntaxError as e:
+        metrics.count("query_errors")
+        await find_operator.finish(f"筛选条件有误：{e}")
+
+    hints: list[str] = []
+    for term in query.terms():
+        if isinstance(term, TextTerm):
+            if len(term.candidates) > 1:
+                alternatives = "' 或 '".join(term.candidates[1:4])
+                hints.append(
+                    f"'{term.keyword}' 已按 '{term.candidates[0]}' 筛选，你是不是想找 '{alternatives}'？"
+                )
+            if conf.search_parity_check:
+                # 全文扫描较慢，放到工作线程中执行
+                _ = await asyncio.to_thread(
+                    check_parity, dataset.index, dataset.records, term.mapped, dataset.search
+                )
+
+    latest = datasets.current
+    if latest is not None and latest.version > dataset.version:
+        # 会话继续使用开始筛选时的数据版本，结果在撤销和随机选择之间保持一致
+        hints.append("干员数据已更新，当前筛选仍基于旧数据，输入 'r' 可切换到最新数据。")
+
+    # 筛选在工作线程中计算，不阻塞事件循环；同一数据集上从相同结果出发的相同筛选只计算一次。
+    # 计算期间数据集被发起计算的请求引用而保持存活，因此键中可以用 id 区分
+    base_mask, base_chain, nodes = current_mask, session.chain, conjuncts(query)
+    current_mask, chain = await flights.run(
+        ("filter", id(dataset), base_chain, base_mask, *map(canonical, nodes)),
+        lambda: asyncio.to_thread(result_cache.apply, dataset, base_chain, base_mask, nodes),
     )
-    await find_operator.finish(result_text.strip())
+    if session.dataset is not dataset or session.mask != base_mask or session.chain != base_chain:
+        # 计算期间同一用户的其他命令修改了会话，在最新的结果上重新叠加
+        dataset = session.dataset
+        current_mask, chain = result_cache.apply(dataset, session.chain, session.mask, nodes)
+    profiler.annotate(result_size=current_mask.bit_count())
+    if not current_mask:
+        metrics.count("empty_results")
+        await find_operator.finish(
+            "\n".join([f"没有找到包含关键词 '{' '.join(keyword_list)}' 的条目。", *hints])
+        )
+
+    session.push(current_mask, chain)
+    with metrics.timer("format_reply"):
+        names = dataset.names_of(current_mask)
+        result_text = f"找到 {len(names)} 个包含关键词 '{' '.join(keyword_list)}' 的条目：\n"
+        result_text += "，".join(names)
+    await find_operator.finish("\n".join([result_text.strip(), *hints]))
 
 
 @random_operator.handle()
-async def handle_random_operator(event: Event, args: Message[Any] = CommandArg()):
+@metrics.timed("random_operator")
+@profiler.profiled("random_operator")
+async def handle_random_operator(bot: Bot, event: Event, args: Message[Any] = CommandArg()):
+    metrics.count("random_requests")
     user_id = event.get_user_id()
-    current_data = find_operator_sessions.get(user_id, None)
+    try:
+        session = await sessions.fetch(user_id)
+    except SessionNotReady:
+        await random_operator.finish(f"干员数据正在准备中，请稍后再试。{pipeline.describe()}")
 
-    if current_data is None:
+    if session is None:
         await random_operator.finish(
             "【随机选择干员命令说明】\n"
             "使用方法：\n"
@@ -192,7 +309,7 @@ async def handle_random_operator(event: Event, args: Message[Any] = CommandArg()
             "注意：请先使用 /筛选 命令进行筛选后再使用此命令。"
         )
 
-    reset_session_timeout(user_id)
+    sessions.touch(user_id, functools.partial(bot.send, event))
 
     num_to_select = 1
     if args.extract_plain_text().strip():
@@ -203,13 +320,62 @@ async def handle_random_operator(event: Event, args: Message[Any] = CommandArg()
 
     if num_to_select < 1:
         await random_operator.finish("请至少选择一个干员。")
-    if num_to_select > len(current_data):
-        await random_operator.finish(
-            f"筛选结果中只有 {len(current_data)} 个干员，无法选择 {num_to_select} 个。"
-        )
+    if num_to_select > len(session):
+        await random_operator.finish(f"筛选结果中只有 {len(session)} 个干员，无法选择 {num_to_select} 个。")
 
-    import random
-
-    selected_operators = random.sample(list(current_data.values()), num_to_select)
-    selected_names: list[str] = [operator.get("name", "N/A") for operator in selected_operators]
+    profiler.annotate(dataset_version=session.dataset.version, candidates=len(session), count=num_to_select)
+    selected_positions = random.sample(list(iter_bits(session.mask)), num_to_select)
+    selected_names = [session.dataset.names[i] for i in selected_positions]
     await random_operator.finish(f"随机选择的干员：{', '.join(selected_names)}")
+
+
+STATUS_TITLES = {
+    "sessions": "会话",
+    "result_cache": "结果缓存",
+    "flights": "请求合并",
+    "mappings": "映射表",
+}
+
+
+@plugin_status.handle()
+async def handle_plugin_status():
+    lines = ["【插件状态】"]
+    dataset = datasets.current
+    if dataset is None:
+        lines.append("数据集：尚未加载")
+    else:
+        live = "、".join(map(str, datasets.live_versions()))
+        lines.append(f"数据集：版本 {dataset.version}，共 {len(dataset)} 名干员，仍在使用的版本 {live}")
+    if progress := pipeline.describe():
+        lines.append(f"数据更新：{progress}")
+    for name, stats in metrics.read_collectors().items():
+        values = "，".join(
+            f"{key}={round(value, 3) if isinstance(value, float) else value}"
+            for key, value in stats.items()
+        )
+        lines.append(f"{STATUS_TITLES.get(name, name)}：{values}")
+    if metrics.enabled:
+        lines.append(metrics.render_text())
+    else:
+        lines.append("未启用性能指标（METRICS_ENABLED），只显示各组件的统计。")
+    await plugin_status.finish("\n".join(lines))
+
+
+@profile_report.handle()
+async def handle_profile_report(args: Message[Any] = CommandArg()):
+    if not profiler.enabled:
+        await profile_report.finish("未启用性能分析，请设置 PROFILE_THRESHOLD 或 PROFILE_SAMPLE_RATE。")
+    captures = await asyncio.to_thread(profiler.captures)
+    if not captures:
+        await profile_report.finish("还没有记录任何性能分析结果。")
+
+    arg = args.extract_plain_text().strip()
+    if not arg:
+        lines = [f"【最慢的调用】（共 {len(captures)} 条记录）"]
+        lines += [f"{i}. {describe_capture(record)}" for i, record in enumerate(captures[:10], 1)]
+        lines.append("输入 /性能分析 <序号> 查看详情。")
+        await profile_report.finish("\n".join(lines))
+
+    if not arg.isdigit() or not 1 <= int(arg) <= len(captures):
+        await profile_report.finish(f"请输入 1 到 {len(captures)} 之间的序号。")
+    await profile_report.finish("\n".join(capture_details(captures[int(arg) - 1])))
@@ -0,0 +1,264 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+
+from .mapping import RARITY_MAPPING
+from .schemas import MergedMapping
+
+_CHINESE_DIGITS = {
+    "零": 0,
+    "〇": 0,
+    "一": 1,
+    "二": 2,
+    "两": 2,
+    "三": 3,
+    "四": 4,
+    "五": 5,
+    "六": 6,
+    "七": 7,
+    "八": 8,
+    "九": 9,
+}
+_CHINESE_UNITS = {"十": 10, "百": 100}
+
+_NUMBER = r"\d+(?:\.\d+)?|[零〇一二两三四五六七八九十百]+"
+_HEIGHT_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(cm|CM|厘米|公分|m|M|米)?")
+_BIRTHDAY_PATTERN = re.compile(r"(\d{1,2})\s*月(?:\s*(\d{1,2})\s*日)?")
+_QUERY_DATE_PATTERN = re.compile(r"^(\d{1,2})(?:月|月份)?(?:(\d{1,2})日?)?$|^(\d{1,2})[./-](\d{1,2})$")
+_YEARS_PATTERN = re.compile(rf"({_NUMBER})?\s*(年半|年|个半月|个月|月)(半)?")
+_RARITY_PATTERN = re.compile(r"^TIER_(\d)$")
+
+
+def parse_chinese_number(text: str) -> float | None:
+    """
+    解析阿拉伯数字或不超过千的中文数字，例如 "12"、"十二"、"两百零五"，无法解析时返回 None。
+    """
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    total = 0
+    digit = None
+    for char in text:
+        if char in _CHINESE_DIGITS:
+            if digit:
+                return None
+            digit = _CHINESE_DIGITS[char]
+        elif char in _CHINESE_UNITS:
+            total += (1 if digit is None else digit) * _CHINESE_UNITS[char]
+            digit = None
+        else:
+            return None
+    return float(total + (digit or 0))
+
+
+def parse_height(text: str):
+    """
+    将身高解析为厘米，例如 "165cm" -> 165、"1.65m" -> 165，取文本中第一个数字。
+    """
+    match = _HEIGHT_PATTERN.search(text)
+    if match is None:
+        return None
+    value = float(match[1])
+    if match[2] in ("m", "M", "米") and value < 10:
+        value *= 100
+    return value
+
+
+def parse_birthday(text: str):
+    """
+    将生日解析为 月*100+日，例如 "12月15日" -> 1215；只有月份时日记为 0。
+    """
+    match = _BIRTHDAY_PATTERN.search(text)
+    if match is None:
+        return None
+    month, day = int(match[1]), int(match[2] or 0)
+    if not 1 <= month <= 12 or day > 31:
+        return None
+    return float(month * 100 + day)
+
+
+def parse_years(text: str):
+    """
+    将战斗经验解析为年数，例如 "六年" -> 6、"一年半" -> 1.5、"三个月" -> 0.25、"没有战斗经验" -> 0。
+    """
+    if text.startswith(("没有", "无")):
+        return 0.0
+    match = _YEARS_PATTERN.search(text)
+    if match is None or text[match.start() - 1 : match.start()] in ("数", "几", "多"):
+        return None
+    number, unit, half = match.groups()
+    if number is None:
+        # "半年"
+        return 0.5 if text.startswith("半") and unit == "年" else None
+    value = parse_chinese_number(number)
+    if value is None:
+        return None
+    if unit in ("年半", "个半月"):
+        value += 0.5
+    elif half:
+        value += 0.5
+    return value / 12 if "月" in unit else value
+
+
+def parse_rarity(text: str):
+    """
+    将稀有度解析为星级，例如 "TIER_6" -> 6。
+    """
+    match = _RARITY_PATTERN.match(text)
+    return float(match[1]) if match else None
+
+
+def _query_number(parse: Callable[[str], float | None]):
+    def parse_query(text: str):
+        value = parse(text)
+        if value is None:
+            value = parse_chinese_number(text)
+        return None if value is None else (value, value)
+
+    return parse_query
+
+
+def _query_birthday(text: str):
+    # 只给出月份时匹配整个月，例如 生日=12月
+    match = _QUERY_DATE_PATTERN.match(text)
+    if match is None:
+        return None
+    month, day = int(match[1] or match[3]), match[2] or match[4]
+    if not 1 <= month <= 12:
+        return None
+    if day is None:
+        return (float(month * 100), float(month * 100 + 31))
+    return (float(month * 100 + int(day)),) * 2
+
+
+def _query_rarity(text: str):
+    text = RARITY_MAPPING.get(text, RARITY_MAPPING.get(f"{text}星", text))
+    value = parse_rarity(text)
+    return None if value is None else (value, value)
+
+
+@dataclass(frozen=True, slots=True)
+class NumericAttribute:
+    """
+    可以按数值比较的字段。
+
+    parse 将数据中的原始文本解析为数值；parse_query 将筛选值解析为闭区间 (下界, 上界)，
+    例如 生日=12月 对应整个十二月。
+    """
+
+    field: str
+    in_stories: bool
+    label: str
+    example: str
+    parse: Callable[[str], float | None]
+    parse_query: Callable[[str], tuple[float, float] | None]
+
+
+NUMERIC_ATTRIBUTES = {
+    attribute.field: attribute
+    for attribute in (
+        NumericAttribute("height", True, "身高", "身高>170", parse_height, _query_number(parse_height)),
+        NumericAttribute("birthday", True, "生日", "生日=12月", parse_birthday, _query_birthday),
+        NumericAttribute(
+            "combat_experience", True, "战斗经验", "战斗经验>=5年", parse_years, _query_number(parse_years)
+        ),
+        NumericAttribute("rarity", False, "稀有度", "稀有度>=5", parse_rarity, _query_rarity),
+    )
+}
+"""解析为数值并建立有序索引的字段"""
+
+
+class SortedIndex:
+    """
+    单个数值字段的有序索引。
+
+    取值按升序保存，prefix[i] 为前 i 个取值对应干员的位图，因此任意区间的结果
+    都可以通过两次二分查找和一次异或得到。
+    """
+
+    def __init__(self, pairs: Iterable[tuple[float, int]]):
+        pairs = sorted(pairs)
+        self.values: tuple[float, ...] = tuple(value for value, _ in pairs)
+        self.positions: tuple[int, ...] = tuple(position for _, position in pairs)
+        prefix = [0]
+        for _, position in pairs:
+            prefix.append(prefix[-1] | 1 << position)
+        self.prefix: tuple[int, ...] = tuple(prefix)
+
+    def __len__(self):
+        return len(self.values)
+
+    def between(self, low: float, high: float) -> int:
+        """
+        返回取值在闭区间 [low, high] 内的干员位图。
+        """
+        return self.prefix[bisect_right(self.values, high)] ^ self.prefix[bisect_left(self.values, low)]
+
+    def compare(self, op: str, low: float, high: float) -> int:
+        """
+        返回与区间比较满足 op 的干员位图，没有取值的干员不参与比较。
+        """
+        if op in ("=", "=="):
+            return self.between(low, high)
+        if op == ">":
+            return self.prefix[-1] ^ self.prefix[bisect_right(self.values, high)]
+        if op == ">=":
+            return self.prefix[-1] ^ self.prefix[bisect_left(self.values, low)]
+        if op == "<":
+            return self.prefix[bisect_left(self.values, low)]
+        if op == "<=":
+            return self.prefix[bisect_right(self.values, high)]
+        raise ValueError(f"有序索引不支持 {op} 比较")
+
+
+class TypedAttributes:
+    """
+    从合并后的干员数据解析出的数值字段及其有序索引。
+
+    数值只在加载数据集时计算，不写入合并后的数据文件，避免改变全文检索的结果。
+    无法解析的原始取值会记录在 failures 中。
+    """
+
+    def __init__(self, records: Iterable[MergedMapping]):
+        pairs: dict[str, list[tuple[float, int]]] = {field: [] for field in NUMERIC_ATTRIBUTES}
+        self.failures: dict[str, list[str]] = {field: [] for field in NUMERIC_ATTRIBUTES}
+
+        for position, record in enumerate(records):
+            stories: Mapping[str, str] = record.get("stories") or {}
+            for field, attribute in NUMERIC_ATTRIBUTES.items():
+                text = stories.get(field) if attribute.in_stories else record.get(field)
+                if not text:
+                    continue
+                value = attribute.parse(str(text))
+                if value is None:
+                    self.failures[field].append(str(text))
+                else:
+                    pairs[field].append((value, position))
+
+        self.indexes: dict[str, SortedIndex] = {field: SortedIndex(pairs[field]) for field in pairs}
+
+    @classmethod
+    def from_pairs(
+        cls, pairs: Mapping[str, Iterable[tuple[float, int]]], failures: Mapping[str, list[str]]
+    ):
+        """
+        用已经解析好的 (数值, 干员序号) 恢复有序索引，用于从快照加载。
+        """
+        attributes = cls.__new__(cls)
+        attributes.failures = {field: list(failures.get(field, ())) for field in NUMERIC_ATTRIBUTES}
+        attributes.indexes = {field: SortedIndex(pairs.get(field, ())) for field in NUMERIC_ATTRIBUTES}
+        return attributes
+
+    def __getitem__(self, field: str):
+        return self.indexes[field]
+
+    def report(self):
+        """
+        返回各字段的解析统计，格式为 {字段: (成功数, 失败数)}。
+        """
+        return {field: (len(self.indexes[field]), len(self.failures[field])) for field in self.indexes}
@@ -0,0 +1,174 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable, Sequence
+from typing import TypeVar
+
+from .dataset import Dataset
+from .metrics import metrics
+from .query import Node, canonical, evaluate
+
+Chain = tuple[str, ...]
+"""会话自重置以来叠加的条件序列，每一项为条件的规范形式"""
+
+T = TypeVar("T")
+
+
+class ResultCache:
+    """
+    所有会话共享的筛选结果缓存，按最近使用的顺序淘汰。
+
+    键为 (数据集版本, 条件序列)，值为依次叠加这些条件后的结果位图。叠加条件时先查找最长的
+    已缓存前缀，例如 `六星 狙击 男` 可以从 `六星 狙击` 的结果开始，只计算剩下的条件。
+    只缓存最新版本的数据集：出现更新的版本时清空缓存，仍在使用旧版本的会话照常计算但不写入缓存。
+
+    `apply` 可以在工作线程中调用，缓存和数据集上的条件缓存由同一把锁保护。
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.version = 0
+        self._entries: OrderedDict[tuple[int, Chain], int] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _usable(self, version: int):
+        if version > self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+        # 未启用的数据集版本号为 0，不参与缓存
+        return self.max_entries > 0 and version == self.version and version > 0
+
+    def _put(self, key: tuple[int, Chain], mask: int):
+        self._entries[key] = mask
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            _ = self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @metrics.timed("filter")
+    def apply(self, dataset: Dataset, chain: Chain | None, mask: int, nodes: Sequence[Node]):
+        """
+        在会话当前的结果 mask（对应条件序列 chain）上叠加 nodes 中的条件，返回 (结果位图, 新的条件序列)。
+
+        chain 为 None 表示会话的条件序列未知（例如从存储中恢复的会话），此时直接计算且不使用缓存。
+        已经在序列中的条件不会重复叠加。
+        """
+        with self._lock:
+            return self._apply(dataset, chain, mask, nodes)
+
+    def _apply(self, dataset: Dataset, chain: Chain | None, mask: int, nodes: Sequence[Node]):
+        if chain is None:
+            for node in nodes:
+                mask &= evaluate(node, dataset)
+            return mask, None
+
+        pending: dict[str, Node] = {}
+        for node in nodes:
+            key = canonical(node)
+            if key not in chain:
+                _ = pending.setdefault(key, node)
+        full = chain + tuple(pending)
+        if not pending:
+            return mask, full
+
+        version = dataset.version
+        usable = self._usable(version)
+        start = len(chain)
+        if usable:
+            for length in range(len(full), len(chain), -1):
+                cached = self._entries.get((version, full[:length]))
+                if cached is not None:
+                    self._entries.move_to_end((version, full[:length]))
+                    if length == len(full):
+                        self.hits += 1
+                    else:
+                        self.prefix_hits += 1
+                    start, mask = length, cached
+                    break
+            else:
+                self.misses += 1
+
+        nodes = list(pending.values())
+        for length in range(start + 1, len(full) + 1):
+            if mask:
+                mask &= evaluate(nodes[length - len(chain) - 1], dataset)
+            if usable:
+                self._put((version, full[:length]), mask)
+        return mask, full
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        返回缓存统计：条目数、完整命中、前缀命中、未命中、淘汰和因数据更新而清空的次数。
+        """
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "prefix_hits": self.prefix_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class SingleFlight:
+    """
+    合并相同键的并发计算：同一时刻每个键只有一个计算在进行，计算完成前到达的相同请求
+    等待并共享它的结果（或异常）。计算完成后键即被移除，结果不会被缓存。
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future[object]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行 func 并返回结果；键为 key 的计算正在进行时改为等待它的结果。
+        """
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # 等待方被取消时不影响正在进行的计算
+            return await asyncio.shield(future)  # pyright: ignore[reportReturnType]
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            _ = future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待方时也不要报告“异常未被获取”
+            _ = future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def stats(self):
+        """
+        返回合并统计：累计调用数、被合并（等待其他调用结果）的调用数和正在进行的计算数。
+        """
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
@@ -0,0 +1,201 @@
+import operator
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from typing import Any
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖
+    np = None
+
+from .index import iter_bits
+from .schemas import MergedMapping
+
+CATEGORICAL_FIELDS = (
+    "profession",
+    "rarity",
+    "position",
+    "nationId",
+    "groupId",
+    "teamId",
+    "subProfessionId",
+    "itemObtainApproach",
+)
+"""单值的低基数字段，按字典编码为整数列"""
+
+MULTI_VALUED_FIELDS = ("tagList",)
+"""列表字段，每个取值单独保存一列布尔值"""
+
+COMPARATORS: dict[str, Callable[[Any, Any], Any]] = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _sort_key(value: str | None):
+    # None 永远排在最前面，编码固定为 0
+    return (value is not None, value or "")
+
+
+class OperatorColumns:
+    """
+    干员属性的列式存储。
+
+    单值字段按取值排序后做字典编码，编码顺序与取值顺序一致，因此等值和大小比较
+    都可以直接在编码列上完成。安装了 numpy 时编码列为 `numpy.ndarray`，过滤结果为布尔数组；
+    否则退化为 `array.array` 和 `bytearray`。所有过滤接口都可以用 `to_bitmap`
+    转换为与 `SearchIndex` 一致的干员序号位图。
+    """
+
+    def __init__(self, records: Iterable[MergedMapping]):
+        records = list(records)
+        self.size = len(records)
+        self.dictionaries: dict[str, tuple[str | None, ...]] = {}
+        self.codes: dict[str, dict[str | None, int]] = {}
+        self.columns: dict[str, Any] = {}
+        self.tags: dict[str, Any] = {}
+
+        for field in CATEGORICAL_FIELDS:
+            values = [record.get(field) for record in records]
+            dictionary = tuple(sorted(set(values), key=_sort_key))
+            codes = {value: code for code, value in enumerate(dictionary)}
+            self.dictionaries[field] = dictionary
+            self.codes[field] = codes
+            column = array("H", (codes[value] for value in values))
+            self.columns[field] = np.frombuffer(column, dtype=np.uint16) if np is not None else column
+
+        for field in MULTI_VALUED_FIELDS:
+            for i, record in enumerate(records):
+                for value in record.get(field) or ():
+                    if value not in self.tags:
+                        self.tags[value] = bytearray(self.size)
+                    self.tags[value][i] = 1
+        if np is not None:
+            self.tags = {value: np.frombuffer(mask, dtype=np.bool_) for value, mask in self.tags.items()}
+
+    def _empty(self):
+        return np.zeros(self.size, dtype=np.bool_) if np is not None else bytearray(self.size)
+
+    def compare(self, field: str, op: str, value: str | None):
+        """
+        返回字段与给定值比较结果的布尔掩码，op 取值见 `COMPARATORS`。
+
+        大小比较按字段取值的字典序进行，例如 rarity 的 "TIER_5" < "TIER_6"。
+        """
+        if field in MULTI_VALUED_FIELDS:
+            if op not in ("=", "==", "!="):
+                raise ValueError(f"字段 {field} 不支持 {op} 比较")
+            mask = self.tags.get(value, self._empty()) if value is not None else self._empty()
+            return self.invert(mask) if op == "!=" else mask
+
+        column = self.columns[field]
+        dictionary = self.dictionaries[field]
+        code = self.codes[field].get(value)
+        if code is None:
+            # 值不在字典中时，用它在有序字典中的插入位置作为比较基准
+            if op in ("=", "=="):
+                return self._empty()
+            if op == "!=":
+                return self.invert(self._empty())
+            position = bisect_left(dictionary, _sort_key(value), key=_sort_key)
+            code = position if op in ("<", ">=") else position - 1
+
+        compare = COMPARATORS[op]
+        if np is not None:
+            return compare(column, code)
+        return bytearray(compare(c, code) for c in column)
+
+    def isin(self, field: str, values: Iterable[str | None]):
+        """
+        返回字段取值属于给定集合的布尔掩码。
+        """
+        if field in MULTI_VALUED_FIELDS:
+            mask = self._empty()
+            for value in values:
+                if value in self.tags:
+                    mask = self.union(mask, self.tags[value])
+            return mask
+
+        wanted = {self.codes[field][value] for value in values if value in self.codes[field]}
+        column = self.columns[field]
+        if np is not None:
+            return np.isin(column, list(wanted))
+        return bytearray(c in wanted for c in column)
+
+    def filter(self, **conditions: str | None):
+        """
+        对多个字段做等值过滤并返回干员位图，例如 `filter(rarity="TIER_6", profession="SNIPER")`。
+        """
+        mask = None
+        for field, value in conditions.items():
+            current = self.compare(field, "=", value)
+            mask = current if mask is None else self.intersect(mask, current)
+        return self.to_bitmap(mask if mask is not None else self.invert(self._empty()))
+
+    def value_counts(self, field: str, bitmap: int | None = None):
+        """
+        统计字段各取值的干员数量，可用位图限定统计范围。
+        """
+        if field in MULTI_VALUED_FIELDS:
+            scope = bitmap if bitmap is not None else -1
+            return {value: (self.to_bitmap(mask) & scope).bit_count() for value, mask in self.tags.items()}
+
+        column = self.columns[field]
+        if bitmap is not None:
+            positions = list(iter_bits(bitmap))
+            column = column[positions] if np is not None else [column[i] for i in positions]
+        if np is not None:
+            counts = np.bincount(column, minlength=len(self.dictionaries[field]))
+        else:
+            counts = [0] * len(self.dictionaries[field])
+            for code in column:
+                counts[code] += 1
+        return {
+            value: int(count)
+            for value, count in zip(self.dictionaries[field], counts, strict=True)
+            if count
+        }
+
+    @staticmethod
+    def intersect(left: Any, right: Any):
+        if np is not None:
+            return left & right
+        return bytearray(a & b for a, b in zip(left, right, strict=True))
+
+    @staticmethod
+    def union(left: Any, right: Any):
+        if np is not None:
+            return left | right
+        return bytearray(a | b for a, b in zip(left, right, strict=True))
+
+    @staticmethod
+    def invert(mask: Any):
+        if np is not None:
+            return ~mask
+        return bytearray(1 - v for v in mask)
+
+    @staticmethod
+    def to_bitmap(mask: Sequence[int] | Any) -> int:
+        """
+        将布尔掩码转换为干员序号位图。
+        """
+        if np is not None:
+            return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+        bitmap = 0
+        for i, value in enumerate(mask):
+            if value:
+                bitmap |= 1 << i
+        return bitmap
+
+
+def build_columns(records: Mapping[str, MergedMapping]):
+    """
+    从合并后的干员数据构建列式存储，干员顺序与传入数据一致。
+    """
+    return OperatorColumns(records.values())
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 
@@ -8,5 +10,65 @@ class Config(BaseModel, extra="ignore"):
     update_on_launch: bool = True
     """配置是否在启动时自动下载资源"""
 
+    fetch_concurrency: int = 3
+    """同时下载的数据表数量上限"""
+
+    fetch_timeout: float = 30.0
+    """单次请求的连接与读取超时（秒）"""
+
+    fetch_retries: int = 2
+    """所有下载源都失败后的重试次数"""
+
+    fetch_backoff: float = 2.0
+    """重试的初始等待时间（秒），每次重试翻倍"""
+
+    fetch_hedge_delay: float | None = 5.0
+    """当前下载源超过该时间（秒）仍未返回数据时，同时向下一个下载源发起请求；设为 None 时只在失败后切换"""
+
+    validate_downloads: bool = True
+    """是否在下载时流式校验数据表的 JSON 结构，发现截断的文件时放弃本次下载"""
+
+    ready_timeout: float = 10.0
+    """数据尚未就绪（例如首次启动时正在下载）时，筛选命令等待数据的最长时间（秒）"""
+
+    session_ttl: float = 120.0
+    """筛选会话在没有操作时保留的时间（秒）"""
+
+    max_sessions: int = 1000
+    """同时保留的筛选会话数量上限，超出时淘汰最久未使用的会话"""
+
+    session_store: Literal["memory", "sqlite"] = "memory"
+    """筛选会话的存储方式：memory 保存在进程内；sqlite 保存在数据目录中，重启后保留并可以在多个进程间共享"""
+
+    session_flush_interval: float = 1.0
+    """筛选会话的修改批量写入存储的间隔（秒），仅用于 sqlite 存储"""
+
+    search_backend: Literal["index", "fts"] = "index"
+    """全文检索后端：index 使用内存中的倒排索引；fts 将数据编译为本地 SQLite FTS5 数据库后检索"""
+
+    result_cache_size: int = 1024
+    """所有会话共享的筛选结果缓存的条目数上限，设为 0 时不缓存"""
+
+    metrics_enabled: bool = False
+    """是否记录各阶段耗时、计数等性能指标，未启用时几乎没有额外开销"""
+
+    metrics_dump_interval: float = 0.0
+    """大于 0 时每隔该时间（秒）将性能指标以 Prometheus 文本格式写入数据目录下的 metrics.prom"""
+
+    profile_threshold: float | None = None
+    """命令处理或数据更新超过该时间（秒）时保存调用栈采样；设为 None 时不按耗时记录"""
+
+    profile_sample_rate: float = 0.0
+    """命令处理和数据更新被随机选中使用 cProfile 完整分析的概率，0 为不抽样"""
+
+    profile_interval: float = 0.005
+    """性能分析时调用栈的采样间隔（秒）"""
+
+    profile_keep: int = 50
+    """数据目录的 profiles 子目录中保留的分析结果数量上限，超出时删除最旧的结果"""
+
+    search_parity_check: bool = False
+    """是否用逐条全文扫描校验索引检索结果（仅用于排查问题，会明显变慢）"""
+
 # # 调用 rebuild() 确保类完全定义
 # Config.model_rebuild()
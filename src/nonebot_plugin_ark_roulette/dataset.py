@@ -0,0 +1,270 @@
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import weakref
+from collections.abc import Callable, Hashable, Mapping
+from pathlib import Path
+from types import MappingProxyType
+
+from nonebot import get_plugin_config, logger
+
+from .attributes import TypedAttributes
+from .columns import OperatorColumns, build_columns
+from .config import Config
+from .fts import FtsSearch, open_search
+from .index import SearchIndex, iter_bits
+from .metrics import metrics
+from .schemas import MergedMapping
+from .snapshot import Snapshot, SnapshotError, read_snapshot, snapshot_path, write_snapshot
+
+conf = get_plugin_config(Config)
+
+TERM_CACHE_SIZE = 4096
+"""每个数据集缓存的筛选条件结果数量上限，超出时丢弃最早的结果"""
+
+
+class Dataset:
+    """
+    只读的干员数据集，由所有会话共享。
+
+    会话只保存干员序号位图，需要干员详情时再通过数据集查询。
+    可以用 `build` 从合并后的数据构建，也可以用 `from_snapshot` 从二进制快照恢复。
+    version 在通过 `DatasetManager.publish` 启用时分配，未启用的数据集为 0。
+    配置了 FTS5 检索后端时，全文检索和字段取值索引由 search_backend 提供。
+    """
+
+    def __init__(
+        self,
+        records: Mapping[str, MergedMapping],
+        index: SearchIndex,
+        columns: OperatorColumns,
+        attributes: TypedAttributes,
+        names: tuple[str, ...],
+    ):
+        self.records: Mapping[str, MergedMapping] = records
+        self.index: SearchIndex = index
+        self.columns: OperatorColumns = columns
+        self.attributes: TypedAttributes = attributes
+        self.names: tuple[str, ...] = names
+        self.version: int = 0
+        self.search_backend: FtsSearch | None = None
+        self._field_values: dict[tuple[str, bool], dict[str, int]] = {}
+        self._term_cache: dict[Hashable, int] = {}
+
+    @classmethod
+    def build(cls, data: Mapping[str, MergedMapping]):
+        """
+        从合并后的干员数据构建数据集。
+        """
+        records = MappingProxyType(dict(data))
+        return cls(
+            records,
+            SearchIndex.build(records),
+            build_columns(records),
+            TypedAttributes(records.values()),
+            tuple(value.get("name", "N/A") for value in records.values()),
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot):
+        """
+        从快照恢复数据集，皮肤和档案保留在 mmap 中按需解码。
+        """
+        return cls(
+            snapshot.records,
+            snapshot.index,
+            OperatorColumns(snapshot.hot),
+            snapshot.attributes,
+            tuple(value.get("name", "N/A") for value in snapshot.hot),
+        )
+
+    @property
+    def ids(self):
+        return self.index.ids
+
+    @property
+    def full_mask(self):
+        return self.index.full_mask
+
+    @functools.cached_property
+    def fingerprint(self):
+        """
+        干员 ID 序列的摘要。位图只依赖干员顺序，指纹相同的数据集之间位图可以直接复用。
+        """
+        return hashlib.blake2b("\x00".join(self.ids).encode(), digest_size=16).hexdigest()
+
+    def __len__(self):
+        return len(self.index.ids)
+
+    @metrics.timed()
+    def search(self, keyword: str) -> int:
+        """
+        返回全文包含关键词（不区分大小写）的干员位图。
+        """
+        if self.search_backend is not None:
+            return self.search_backend.search(keyword)
+        return self.index.search(keyword)
+
+    def field_values(self, field: str, in_stories: bool = False):
+        """
+        返回字段取值到干员位图的索引，首次访问时构建。in_stories 为 True 时读取档案字段。
+        """
+        key = (field, in_stories)
+        if key not in self._field_values and self.search_backend is not None:
+            self._field_values[key] = self.search_backend.field_values(field, in_stories)
+        if key not in self._field_values:
+            values: dict[str, int] = {}
+            for i, record in enumerate(self.records.values()):
+                source = record.get("stories", {}) if in_stories else record
+                value = source.get(field)
+                if isinstance(value, str):
+                    values[value] = values.get(value, 0) | 1 << i
+            self._field_values[key] = values
+        return self._field_values[key]
+
+    def cached_term(self, key: Hashable, compute: Callable[[], int]):
+        """
+        返回单个筛选条件的结果位图，同一数据集上相同的条件只计算一次。
+        """
+        mask = self._term_cache.get(key)
+        if mask is None:
+            if len(self._term_cache) >= TERM_CACHE_SIZE:
+                self._term_cache.pop(next(iter(self._term_cache)))
+            mask = self._term_cache[key] = compute()
+        return mask
+
+    def names_of(self, mask: int):
+        """
+        返回位图中干员的名称，按数据集顺序排列。
+        """
+        return [self.names[i] for i in iter_bits(mask)]
+
+
+def _log_released(version: int):
+    logger.debug(f"数据集版本 {version} 已不再被引用，已释放。")
+
+
+class DatasetManager:
+    """
+    管理数据集的版本。
+
+    新版本在后台完整构建后通过 `publish` 整体替换当前版本，读取方只会拿到完整的数据集。
+    会话持有开始筛选时的版本，旧版本在没有会话引用后由垃圾回收释放；
+    这里只以弱引用记录仍然存活的版本，不会延长它们的生命周期。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current: Dataset | None = None
+        self._source: tuple[Path, int] | None = None
+        self._live: weakref.WeakValueDictionary[int, Dataset] = weakref.WeakValueDictionary()
+        self.version = 0
+
+    @property
+    def current(self):
+        """
+        当前版本的数据集，尚未加载过时为 None。
+        """
+        return self._current
+
+    def lookup(self, path: Path, mtime: int):
+        """
+        当前版本由 path 在 mtime 时的内容构建时返回它，否则返回 None。
+        """
+        with self._lock:
+            return self._current if self._source == (path, mtime) else None
+
+    def publish(self, dataset: Dataset, path: Path, mtime: int):
+        """
+        将由 path 在 mtime 时的内容构建的数据集启用为新版本。
+
+        读取较早的文件得到的数据集不会替换更新的版本，此时返回当前版本。
+        """
+        with self._lock:
+            if self._current is not None and self._source is not None and self._source[1] > mtime:
+                return self._current
+            self.version += 1
+            dataset.version = self.version
+            self._live[self.version] = dataset
+            self._current, self._source = dataset, (path, mtime)
+            _ = weakref.finalize(dataset, _log_released, self.version)
+        logger.info(f"数据集版本 {dataset.version} 已启用。")
+        return dataset
+
+    def live_versions(self):
+        """
+        返回仍被引用的版本号，包括当前版本。
+        """
+        return sorted(self._live.keys())
+
+
+datasets = DatasetManager()
+
+
+def _log_loaded(dataset: Dataset, source: str):
+    logger.info(
+        f"干员数据集已从{source}加载，共 {len(dataset)} 名干员，{len(dataset.index.bigrams)} 个二字词项。"
+    )
+    for field, failures in dataset.attributes.failures.items():
+        if failures:
+            logger.warning(
+                f"字段 {field} 有 {len(failures)} 个取值无法解析为数值，"
+                f"例如：{'、'.join(dict.fromkeys(failures[:5]))}"
+            )
+
+
+def _attach_search(dataset: Dataset, path: Path):
+    if conf.search_backend != "fts":
+        return
+    try:
+        dataset.search_backend = open_search(
+            path, dataset.fingerprint, dataset.ids, dataset.index.docs, dataset.records
+        )
+    except (OSError, sqlite3.Error):
+        logger.exception("无法使用 FTS5 检索数据库，改用内存索引：")
+
+
+@metrics.timed()
+def load_dataset(path: Path):
+    """
+    读取合并后的数据文件，文件未变化时直接复用当前版本的数据集。
+
+    优先读取对应的二进制快照，快照不存在、损坏或已过期时读取 JSON 并重新生成快照。
+    """
+    mtime = path.stat().st_mtime_ns
+    if (dataset := datasets.lookup(path, mtime)) is not None:
+        return dataset
+
+    try:
+        dataset = Dataset.from_snapshot(read_snapshot(snapshot_path(path), path))
+    except FileNotFoundError:
+        pass
+    except SnapshotError as e:
+        logger.warning(f"无法使用数据快照（{e}），改为读取 {path.name}。")
+    else:
+        _log_loaded(dataset, "快照")
+        _attach_search(dataset, path)
+        return datasets.publish(dataset, path, mtime)
+
+    with open(path, encoding="utf-8") as f:
+        data: dict[str, MergedMapping] = json.load(f)
+    return store_dataset(path, data)
+
+
+@metrics.timed()
+def store_dataset(path: Path, data: Mapping[str, MergedMapping]):
+    """
+    在写出合并后的数据文件后直接用内存中的数据构建数据集，避免再次读取文件，同时写出快照。
+    快照写出后新数据集才启用为当前版本。
+    """
+    mtime = path.stat().st_mtime_ns
+    dataset = Dataset.build(data)
+    _log_loaded(dataset, "数据文件")
+    try:
+        write_snapshot(snapshot_path(path), path, dataset.records, dataset.index, dataset.attributes)
+    except OSError:
+        logger.exception("写入数据快照失败：")
+    _attach_search(dataset, path)
+    return datasets.publish(dataset, path, mtime)
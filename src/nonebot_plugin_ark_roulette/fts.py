@@ -0,0 +1,209 @@
+"""
+基于 SQLite FTS5 的检索后端，由 `search_backend = "fts"` 启用。
+
+合并后的数据编译为一个本地 SQLite 数据库：
+
+    operators          干员序号、ID、名称
+    operator_fields    干员的字符串字段（字段名, 取值）
+    operator_tags      干员标签
+    operator_stories   干员档案（字段名, 取值）
+    operator_skins     皮肤信息
+    operator_text      FTS5 全文索引（trigram 分词），rowid 为干员序号
+
+全文索引的文本与 `serialize_record` 生成的小写文本相同，分词器区分大小写，
+因此检索结果与默认的内存索引完全一致。不少于三个字的关键词走 FTS5 索引，
+更短的关键词无法用 trigram 检索，改为用 instr 在数据库中扫描。
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+
+from .schemas import MergedMapping
+from .utils import atomic_replace
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE operators (position INTEGER PRIMARY KEY, char_id TEXT NOT NULL UNIQUE, name TEXT);
+CREATE TABLE operator_fields (position INTEGER NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL);
+CREATE TABLE operator_tags (position INTEGER NOT NULL, tag TEXT NOT NULL);
+CREATE TABLE operator_stories (position INTEGER NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL);
+CREATE TABLE operator_skins (
+    position INTEGER NOT NULL,
+    skin_id TEXT,
+    model_name TEXT,
+    skin_group_name TEXT,
+    content TEXT,
+    drawers TEXT,
+    designers TEXT
+);
+CREATE VIRTUAL TABLE operator_text USING fts5(doc, tokenize = 'trigram case_sensitive 1');
+"""
+
+_INDEXES = """
+CREATE INDEX operator_fields_field ON operator_fields (field, value);
+CREATE INDEX operator_tags_tag ON operator_tags (tag);
+CREATE INDEX operator_stories_field ON operator_stories (field, value);
+CREATE INDEX operator_skins_position ON operator_skins (position);
+"""
+
+
+def database_path(path: Path):
+    """
+    返回数据文件对应的检索数据库路径。
+    """
+    return path.with_suffix(".sqlite3")
+
+
+def _source_key(source: Path, fingerprint: str):
+    stat = source.stat()
+    return json.dumps([SCHEMA_VERSION, stat.st_size, stat.st_mtime_ns, fingerprint])
+
+
+def _write_database(
+    path: Path,
+    key: str,
+    ids: Sequence[str],
+    docs: Iterable[str],
+    records: Iterable[MergedMapping],
+):
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_name)
+        try:
+            _ = conn.execute("PRAGMA journal_mode = OFF")
+            _ = conn.executescript(_SCHEMA)
+            with conn:
+                _ = conn.execute("INSERT INTO meta VALUES ('source', ?)", (key,))
+                _ = conn.executemany(
+                    "INSERT INTO operator_text (rowid, doc) VALUES (?, ?)", enumerate(docs)
+                )
+                for position, (char_id, record) in enumerate(zip(ids, records, strict=True)):
+                    _ = conn.execute(
+                        "INSERT INTO operators VALUES (?, ?, ?)", (position, char_id, record.get("name"))
+                    )
+                    _ = conn.executemany(
+                        "INSERT INTO operator_fields VALUES (?, ?, ?)",
+                        [
+                            (position, field, value)
+                            for field, value in record.items()
+                            if isinstance(value, str)
+                        ],
+                    )
+                    _ = conn.executemany(
+                        "INSERT INTO operator_tags VALUES (?, ?)",
+                        [(position, tag) for tag in record.get("tagList") or ()],
+                    )
+                    _ = conn.executemany(
+                        "INSERT INTO operator_stories VALUES (?, ?, ?)",
+                        [
+                            (position, field, value)
+                            for field, value in (record.get("stories") or {}).items()
+                            if isinstance(value, str)
+                        ],
+                    )
+                    _ = conn.executemany(
+                        "INSERT INTO operator_skins VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                position,
+                                skin.get("skinId"),
+                                skin.get("modelName"),
+                                skin.get("skinGroupName"),
+                                skin.get("content"),
+                                json.dumps(skin.get("drawerList"), ensure_ascii=False),
+                                json.dumps(skin.get("designerList"), ensure_ascii=False),
+                            )
+                            for skin in record.get("skins") or ()
+                        ],
+                    )
+            _ = conn.executescript(_INDEXES)
+            with conn:
+                _ = conn.execute("INSERT INTO operator_text (operator_text) VALUES ('optimize')")
+        finally:
+            conn.close()
+        atomic_replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class FtsSearch:
+    """
+    检索数据库的只读连接，检索结果与 `SearchIndex` 相同，用干员序号位图表示。
+
+    连接在事件循环和工作线程之间共享，查询由锁串行化。
+    """
+
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.full_mask = (1 << size) - 1
+        self._conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def _mask(self, sql: str, params: tuple[str, ...]):
+        mask = 0
+        with self._lock:
+            for (position,) in self._conn.execute(sql, params):
+                mask |= 1 << position
+        return mask
+
+    def search(self, keyword: str) -> int:
+        """
+        返回全文包含关键词（不区分大小写）的干员位图。
+        """
+        keyword = keyword.lower()
+        if not keyword:
+            return self.full_mask
+        if len(keyword) < 3:
+            return self._mask("SELECT rowid FROM operator_text WHERE instr(doc, ?) > 0", (keyword,))
+        phrase = '"' + keyword.replace('"', '""') + '"'
+        return self._mask("SELECT rowid FROM operator_text WHERE operator_text MATCH ?", (phrase,))
+
+    def field_values(self, field: str, in_stories: bool = False):
+        """
+        返回字段取值到干员位图的索引，与 `Dataset.field_values` 相同，但不需要解码干员档案。
+        """
+        table = "operator_stories" if in_stories else "operator_fields"
+        values: dict[str, int] = {}
+        with self._lock:
+            rows = self._conn.execute(f"SELECT value, position FROM {table} WHERE field = ?", (field,))
+            for value, position in rows:
+                values[value] = values.get(value, 0) | 1 << position
+        return values
+
+    def close(self):
+        self._conn.close()
+
+
+def open_search(
+    source: Path,
+    fingerprint: str,
+    ids: Sequence[str],
+    docs: Iterable[str],
+    records: Mapping[str, MergedMapping],
+):
+    """
+    打开 source 对应的检索数据库，不存在或与数据不一致时先重新生成。
+    docs 为各干员的全文（与 `SearchIndex.docs` 相同），只在需要重新生成时读取。
+    """
+    path = database_path(source)
+    key = _source_key(source, fingerprint)
+    try:
+        conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        row = None
+    if row is None or row[0] != key:
+        _write_database(path, key, ids, docs, records.values())
+    return FtsSearch(path, len(ids))
@@ -1,10 +1,13 @@
 import asyncio
+import hashlib
+from dataclasses import dataclass
 
 from nonebot import get_plugin_config, require
 
-from .ArkSrc import fetch_data_by_name
+from .ArkSrc import fetch_data_by_name, load_manifest
 from .config import Config
-from .utils import require_json
+from .metrics import metrics
+from .utils import project_json
 
 _ = require("nonebot_plugin_localstore")
 
@@ -15,17 +18,26 @@ DATA_DIR = get_plugin_data_dir()
 conf = get_plugin_config(Config)
 PROXY = conf.proxy
 
-from .schemas import HandbookInfoTable
+from .schemas import HandbookData
 
+HANDBOOK_PATH = DATA_DIR / "handbook_info_table.json"
 
-@require_json(DATA_DIR / "handbook_info_table.json")
-def load_handbook(handbook_data: HandbookInfoTable):
+ARCHIVE_TITLES = ("基础档案",)
+"""需要解析的档案标题"""
+
+
+HANDBOOK_FIELDS = ("storyTextAudio.storyTitle", "storyTextAudio.stories.storyText")
+"""从 handbook_info_table.json 的 handbookDict 表中读取的字段"""
+
+
+@metrics.timed()
+@metrics.traced()
+@project_json(HANDBOOK_PATH, "handbookDict", fields=HANDBOOK_FIELDS)
+def load_handbook(handbook_dict: dict[str, HandbookData]):
     """
     从 handbook_info_table.json 中提取 handbookDict 表下的 storyTitle 和 storyText 数据。
     """
 
-    # 提取 handbookDict 数据
-    handbook_dict = handbook_data.get("handbookDict", {})
     formatted_data: dict[str, dict[str, str]] = {}
 
     for char_id, char_data in handbook_dict.items():
@@ -51,10 +63,68 @@ def retrieve_info(handbook_data: dict[str, dict[str, str]], char_id: str, title:
     return None
 
 
+@dataclass(frozen=True, slots=True)
+class ArchiveSection:
+    """
+    解析后的一篇档案，lines 保留原始的行。
+    """
+
+    lines: tuple[str, ...]
+
+
+def parse_section(text: str):
+    """
+    将一篇档案按行切分。
+    """
+    return ArchiveSection(tuple(text.split("\n")))
+
+
+def parse_handbook(handbook_data: dict[str, dict[str, str]]):
+    """
+    解析所有干员的基础档案，返回 {角色 ID: {标题: 档案}}。
+    """
+    return {
+        char_id: {title: parse_section(stories[title]) for title in ARCHIVE_TITLES if title in stories}
+        for char_id, stories in handbook_data.items()
+    }
+
+
+def handbook_digest():
+    """
+    返回 handbook_info_table.json 的内容哈希。
+
+    优先使用数据清单中下载时记录的哈希，本地文件大小与记录不符时（例如手动替换了文件）重新计算。
+    """
+    table = load_manifest()["tables"].get("handbook_info_table")
+    if table is not None and table["size"] == HANDBOOK_PATH.stat().st_size:
+        return table["sha256"]
+    with open(HANDBOOK_PATH, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+_cached_archives: tuple[str, dict[str, dict[str, ArchiveSection]]] | None = None
+
+
+@metrics.timed()
+def load_archives():
+    """
+    加载并解析干员档案，档案表内容未变化时直接复用上次的解析结果。
+    """
+    global _cached_archives
+
+    digest = handbook_digest()
+    if _cached_archives is not None and _cached_archives[0] == digest:
+        return _cached_archives[1]
+
+    archives = parse_handbook(load_handbook())
+    _cached_archives = (digest, archives)
+    return archives
+
+
 # 示例调用
 if __name__ == "__main__":
     _ = asyncio.run(fetch_data_by_name("handbook_info_table", PROXY))
-    handbook_stories = load_handbook()
-    for char_id, stories in handbook_stories.items():
-        gender = retrieve_info(handbook_stories, char_id, "综合体检测试", "物理强度")
+    for char_id, sections in load_archives().items():
+        section = sections.get("基础档案")
+        gender = next((line for line in section.lines if "性别" in line), None) if section else None
         print(f"角色 ID: {char_id}, 值: {gender}")  # noqa: T201  # print in standalone mode
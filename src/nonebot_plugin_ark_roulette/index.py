@@ -0,0 +1,238 @@
+import json
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+
+from nonebot import logger
+
+from .schemas import MergedMapping
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """
+    按从小到大的顺序遍历位图中为 1 的位序号。
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def serialize_record(record: object):
+    """
+    将单条干员数据序列化为用于全文匹配的小写文本，与 search_raw_data 使用的文本完全一致。
+    """
+    return json.dumps(record, ensure_ascii=False).lower()
+
+
+class SearchIndex:
+    """
+    合并后干员数据的倒排索引。
+
+    每个干员按在数据集中的顺序分配一个序号，检索结果用整数位图表示。
+    索引以单字和相邻二字为词项，查询时先对关键词的全部二字词项求交集得到候选集，
+    再在候选集上做一次子串校验，因此结果与逐条 `json.dumps` 后做子串匹配完全一致。
+    """
+
+    def __init__(self, ids: Iterable[str], docs: Iterable[str]):
+        self.ids: tuple[str, ...] = tuple(ids)
+        self.docs: Sequence[str] = tuple(docs)
+        self.positions: dict[str, int] = {char_id: i for i, char_id in enumerate(self.ids)}
+        self.full_mask: int = (1 << len(self.ids)) - 1
+
+        unigrams: dict[str, int] = {}
+        bigrams: dict[str, int] = {}
+        for i, doc in enumerate(self.docs):
+            bit = 1 << i
+            for gram in set(doc):
+                unigrams[gram] = unigrams.get(gram, 0) | bit
+            for gram in {doc[j : j + 2] for j in range(len(doc) - 1)}:
+                bigrams[gram] = bigrams.get(gram, 0) | bit
+        self.unigrams = unigrams
+        self.bigrams = bigrams
+
+    @classmethod
+    def build(cls, data: Mapping[str, MergedMapping]):
+        """
+        从合并后的干员数据构建索引。
+        """
+        return cls(data.keys(), (serialize_record(value) for value in data.values()))
+
+    @classmethod
+    def from_postings(
+        cls,
+        ids: Iterable[str],
+        docs: Sequence[str],
+        unigrams: dict[str, int],
+        bigrams: dict[str, int],
+        contains: Callable[[int, str], bool] | None = None,
+    ):
+        """
+        用已经构建好的倒排表恢复索引。docs 可以是按需解码的序列，
+        此时可以通过 contains 提供不解码文本的子串判断。
+        """
+        index = cls.__new__(cls)
+        index.ids = tuple(ids)
+        index.docs = docs
+        index.positions = {char_id: i for i, char_id in enumerate(index.ids)}
+        index.full_mask = (1 << len(index.ids)) - 1
+        index.unigrams = unigrams
+        index.bigrams = bigrams
+        if contains is not None:
+            index.contains = contains
+        return index
+
+    def contains(self, i: int, keyword: str):
+        """
+        判断第 i 个干员的全文是否包含关键词，关键词需已转为小写。
+        """
+        return keyword in self.docs[i]
+
+    def search(self, keyword: str) -> int:
+        """
+        返回全文包含关键词（不区分大小写）的干员位图。
+        """
+        keyword = keyword.lower()
+        if not keyword:
+            return self.full_mask
+        if len(keyword) == 1:
+            return self.unigrams.get(keyword, 0)
+
+        candidates = self.full_mask
+        for gram in {keyword[j : j + 2] for j in range(len(keyword) - 1)}:
+            candidates &= self.bigrams.get(gram, 0)
+            if not candidates:
+                return 0
+        if len(keyword) == 2:
+            return candidates
+
+        contains = self.contains
+        mask = 0
+        for i in iter_bits(candidates):
+            if contains(i, keyword):
+                mask |= 1 << i
+        return mask
+
+    def matches(self, mask: int, char_id: str):
+        """
+        判断干员是否在位图中。
+        """
+        position = self.positions.get(char_id)
+        return position is not None and bool(mask >> position & 1)
+
+    def mask_of(self, char_ids: Iterable[str]):
+        """
+        将干员 ID 集合转换为位图，忽略索引中不存在的 ID。
+        """
+        mask = 0
+        for char_id in char_ids:
+            position = self.positions.get(char_id)
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    def ids_of(self, mask: int):
+        """
+        将位图转换为按数据集顺序排列的干员 ID 列表。
+        """
+        return [self.ids[i] for i in iter_bits(mask)]
+
+
+def check_parity(
+    index: SearchIndex,
+    data: Mapping[str, MergedMapping],
+    keyword: str,
+    search: Callable[[str], int] | None = None,
+):
+    """
+    用旧的逐条序列化扫描校验索引结果，不一致时记录警告并返回 False。
+    search 为实际使用的检索函数，默认为 index.search。
+    """
+    from .mapping import search_raw_data
+
+    expected = {key for result in search_raw_data(data, keyword) for key in result}
+    actual = set(index.ids_of((search or index.search)(keyword) & index.mask_of(data)))
+    if expected != actual:
+        logger.warning(
+            f"关键词 '{keyword}' 的索引结果与全文扫描不一致："
+            f"缺少 {sorted(expected - actual)}，多出 {sorted(actual - expected)}"
+        )
+        return False
+    return True
+
+
+class SubstringIndex:
+    """
+    字符串集合上的子串索引，用于映射表关键词的模糊匹配。
+
+    `containing` 通过单字/二字倒排表找出包含查询串的键；`contained_in` 枚举查询串中
+    与已有键等长的子串并直接查表，找出被查询串包含的键。两者的代价都只与查询串长度
+    和候选数量有关，与键的总数无关。
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys: tuple[str, ...] = tuple(dict.fromkeys(keys))
+        self.positions: dict[str, int] = {key: i for i, key in enumerate(self.keys)}
+        self.lengths: tuple[int, ...] = tuple(sorted({len(key) for key in self.keys}))
+        self.full_mask: int = (1 << len(self.keys)) - 1
+
+        unigrams: dict[str, int] = {}
+        bigrams: dict[str, int] = {}
+        for i, key in enumerate(self.keys):
+            bit = 1 << i
+            for gram in set(key):
+                unigrams[gram] = unigrams.get(gram, 0) | bit
+            for gram in {key[j : j + 2] for j in range(len(key) - 1)}:
+                bigrams[gram] = bigrams.get(gram, 0) | bit
+        self.unigrams = unigrams
+        self.bigrams = bigrams
+
+    def containing(self, text: str) -> int:
+        """
+        返回包含 text 的键的位图。
+        """
+        if len(text) == 1:
+            return self.unigrams.get(text, 0)
+
+        candidates = self.full_mask
+        for gram in {text[j : j + 2] for j in range(len(text) - 1)}:
+            candidates &= self.bigrams.get(gram, 0)
+            if not candidates:
+                return 0
+        mask = 0
+        for i in iter_bits(candidates):
+            if text in self.keys[i]:
+                mask |= 1 << i
+        return mask
+
+    def contained_in(self, text: str) -> int:
+        """
+        返回是 text 子串的键的位图。
+        """
+        mask = 0
+        for length in self.lengths:
+            if length > len(text):
+                break
+            for start in range(len(text) - length + 1):
+                position = self.positions.get(text[start : start + length])
+                if position is not None:
+                    mask |= 1 << position
+        return mask
+
+    def candidates(self, text: str) -> list[str]:
+        """
+        返回与 text 互为子串关系的全部键，按以下规则排序：
+
+        1. 与 text 的长度差越小越靠前；
+        2. 长度差相同时，被 text 包含的键优先于包含 text 的键；
+        3. 仍然相同时按键在原映射表中的顺序排列。
+
+        空串不与任何键匹配。
+        """
+        if not text:
+            return []
+
+        contained = self.contained_in(text)
+        ranked = sorted(
+            iter_bits(contained | self.containing(text)),
+            key=lambda i: (abs(len(self.keys[i]) - len(text)), not contained >> i & 1, i),
+        )
+        return [self.keys[i] for i in ranked]
@@ -1,8 +1,12 @@
 import json
+import threading
+import time
 from collections.abc import Hashable, Mapping
-from typing import TypeVar
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Literal, TypeVar
 
-from nonebot import require
+from nonebot import logger, require
 
 _ = require("nonebot_plugin_localstore")
 
@@ -10,8 +14,10 @@ from nonebot_plugin_localstore import get_plugin_data_dir
 
 DATA_DIR = get_plugin_data_dir()
 
-from .schemas import HandbookTeam, UniEquipTable
-from .utils import require_json
+from .index import SubstringIndex
+from .metrics import metrics
+from .schemas import HandbookTeam, SubProfession
+from .utils import project_json
 
 FIELD_MAPPING = {
     "name": "姓名",
@@ -116,13 +122,13 @@ RARITY_MAPPING = {
 }
 
 
-@require_json(DATA_DIR / "uniequip_table.json")
-def load_sub_profession_mapping(uniequip_data: UniEquipTable):
+@metrics.traced()
+@project_json(DATA_DIR / "uniequip_table.json", "subProfDict", fields=("subProfessionName",))
+def load_sub_profession_mapping(sub_prof_dict: dict[str, SubProfession]):
     """
     加载子职业数据建立双向映射表。
     """
 
-    sub_prof_dict = uniequip_data.get("subProfDict", {})
     mapping: dict[str, str] = {}
     for key, value in sub_prof_dict.items():
         sub_profession_name = value.get("subProfessionName", key)
@@ -132,7 +138,8 @@ def load_sub_profession_mapping(uniequip_data: UniEquipTable):
     return mapping
 
 
-@require_json(DATA_DIR / "handbook_team_table.json")
+@metrics.traced()
+@project_json(DATA_DIR / "handbook_team_table.json", fields=("powerName",))
 def load_handbook_team_table(handbook_team_data: dict[str, HandbookTeam]):
     """
     加载国家、地区、组织数据建立双向映射表。
@@ -151,23 +158,23 @@ def load_team_sub_mapping():
     """
     加载子职业和国家、地区、组织数据建立双向映射表。
     """
-    sub_profession_mapping = load_sub_profession_mapping() or {}
-    team_nation_mapping = load_handbook_team_table() or {}
-
-    mapping = {**sub_profession_mapping, **team_nation_mapping, **BASIC_ARCHIVES, **FIELD_MAPPING}
-
-    return mapping
+    return mapping_registry.snapshot().team_sub_mapping
 
 
 def load_mappings():
     """
     加载所有映射表并合并为一个大表。
     """
-    sub_profession_mapping = load_sub_profession_mapping() or {}
-    team_nation_mapping = load_handbook_team_table() or {}
+    return mapping_registry.snapshot().combined_mapping
+
+
+def _build_team_sub_mapping(sub_profession_mapping: dict[str, str], team_nation_mapping: dict[str, str]):
+    return {**sub_profession_mapping, **team_nation_mapping, **BASIC_ARCHIVES, **FIELD_MAPPING}
+
 
+def _build_combined_mapping(sub_profession_mapping: dict[str, str], team_nation_mapping: dict[str, str]):
     # 合并所有映射表
-    combined_mapping = {
+    return {
         **FIELD_MAPPING,
         **PROFESSION_MAPPING,
         **POSITION_MAPPING,
@@ -177,33 +184,148 @@ def load_mappings():
         **team_nation_mapping,
     }
 
-    return combined_mapping
 
+@dataclass(frozen=True, slots=True)
+class MappingSnapshot:
+    """
+    某一时刻构建完成的映射表，构建后只读。
+    """
 
-def map_tables(value: str):
+    combined_mapping: Mapping[str, str]
+    team_sub_mapping: Mapping[str, str]
+    key_index: SubstringIndex
+    team_sub_index: SubstringIndex
+    built_at: float
+    build_seconds: float
+
+
+class MappingRegistry:
     """
-    根据键查询映射表并返回对应的值，支持关键词匹配。
+    进程级映射表注册中心。
+
+    映射表在首次使用时构建，之后只由数据更新流水线在工作线程中调用 `build` 重建；
+    构建完成后整体替换，读取方在重建期间继续使用旧的映射表，不会看到构建到一半的映射表。
+    """
+
+    def __init__(self):
+        self._snapshot: MappingSnapshot | None = None
+        self._lock = threading.Lock()
+        # 命中统计在工作线程中更新，单独加锁，避免在重建映射表期间阻塞查询
+        self._stats_lock = threading.Lock()
+        self.builds = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    def record_hit(self, kind: Literal["exact", "fuzzy", "miss"]):
+        """
+        记录一次查询的命中类型。
+        """
+        with self._stats_lock:
+            if kind == "exact":
+                self.exact_hits += 1
+            elif kind == "fuzzy":
+                self.fuzzy_hits += 1
+            else:
+                self.misses += 1
+
+    @metrics.timed("build_mappings")
+    def build(self):
+        """
+        重新读取源文件并构建映射表，构建完成后原子替换当前映射表。
+        """
+        with self._lock:
+            start = time.perf_counter()
+            sub_profession_mapping = load_sub_profession_mapping() or {}
+            team_nation_mapping = load_handbook_team_table() or {}
+            combined_mapping = _build_combined_mapping(sub_profession_mapping, team_nation_mapping)
+            team_sub_mapping = _build_team_sub_mapping(sub_profession_mapping, team_nation_mapping)
+            snapshot = MappingSnapshot(
+                combined_mapping=MappingProxyType(combined_mapping),
+                team_sub_mapping=MappingProxyType(team_sub_mapping),
+                key_index=SubstringIndex(combined_mapping),
+                team_sub_index=SubstringIndex(team_sub_mapping),
+                built_at=time.time(),
+                build_seconds=time.perf_counter() - start,
+            )
+            self._snapshot = snapshot
+            self.builds += 1
+
+        logger.info(
+            f"映射表构建完成，共 {len(snapshot.combined_mapping)} 项，"
+            f"耗时 {snapshot.build_seconds * 1000:.1f} ms。"
+        )
+        return snapshot
+
+    def snapshot(self):
+        """
+        获取当前映射表，尚未构建时同步构建。源文件变化后仍返回旧的映射表，直到重新调用 `build`，
+        避免在事件循环中解析数据表。
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.build()
+        return snapshot
+
+    def stats(self):
+        """
+        返回映射表的构建与命中统计。
+        """
+        snapshot = self._snapshot
+        with self._stats_lock:
+            hits = {"exact_hits": self.exact_hits, "fuzzy_hits": self.fuzzy_hits, "misses": self.misses}
+        return {
+            "size": len(snapshot.combined_mapping) if snapshot else 0,
+            "builds": self.builds,
+            "build_seconds": snapshot.build_seconds if snapshot else None,
+            "built_at": snapshot.built_at if snapshot else None,
+            **hits,
+        }
+
+
+mapping_registry = MappingRegistry()
+
+
+@metrics.timed()
+def resolve_keyword(value: str):
     """
-    # 加载映射表
-    mappings = load_mappings()
+    查询映射表，返回映射后的值和模糊匹配的候选键。
+
+    精确命中时候选键为空；没有精确命中时，候选键按 `SubstringIndex.candidates`
+    的规则排序，映射结果取排名第一的键；没有任何候选时返回原始值。
+    """
+    snapshot = mapping_registry.snapshot()
+    mappings = snapshot.combined_mapping
 
     # 精确匹配
     if value in mappings:
-        return mappings[value]
+        mapping_registry.record_hit("exact")
+        return mappings[value], []
 
     # 关键词匹配
-    for key, mapped_value in mappings.items():
-        if key in value or value in key:
-            return mapped_value
+    candidates = snapshot.key_index.candidates(value)
+    if candidates:
+        mapping_registry.record_hit("fuzzy")
+        return mappings[candidates[0]], candidates
 
     # 如果没有找到匹配的值，则返回原始值
-    return value
+    mapping_registry.record_hit("miss")
+    return value, []
+
+
+@metrics.timed()
+def map_tables(value: str):
+    """
+    根据键查询映射表并返回对应的值，支持关键词匹配。
+    """
+    return resolve_keyword(value)[0]
 
 
 KT = TypeVar("KT", bound=Hashable)
 VT = TypeVar("VT")
 
 
+@metrics.timed()
 def search_raw_data(data: Mapping[KT, VT], keyword: str) -> list[Mapping[KT, VT]]:
     """
     在数据中搜索包含关键词的条目。
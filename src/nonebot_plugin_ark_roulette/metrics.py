@@ -0,0 +1,377 @@
+"""
+插件内置的性能指标：各阶段耗时的直方图、计数器和内存等状态量。
+
+由 `metrics_enabled` 启用。未启用时 `timed` 在定义函数时直接返回原函数，`timer` 返回共享的空上下文，
+`count` 立即返回，不产生可观的开销。状态量和组件统计只在读取指标时计算。
+"""
+
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections.abc import Callable, Mapping
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+from typing import Any, TypeVar
+
+from nonebot import logger, require
+from nonebot.plugin import get_plugin_config
+
+from .config import Config
+from .utils import atomic_open
+
+_ = require("nonebot_plugin_localstore")
+
+from nonebot_plugin_localstore import get_plugin_data_dir
+
+DATA_DIR = get_plugin_data_dir()
+
+METRICS_PATH = DATA_DIR / "metrics.prom"
+
+PREFIX = "ark_roulette"
+
+conf = get_plugin_config(Config)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+"""耗时直方图的桶上界（秒），最后还有一个 +Inf 桶"""
+
+
+class Histogram:
+    """
+    固定分桶的耗时直方图，分位数在桶内线性插值估计。
+    """
+
+    __slots__ = ("count", "counts", "max", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float):
+        """
+        估计 q 分位数（秒），没有样本时返回 0。
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / count, self.max)
+            cumulative += count
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_: object):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+_NULL_TIMER = nullcontext()
+
+
+def resident_bytes():
+    """
+    返回进程当前占用的物理内存（字节），无法读取时（非 Linux 平台）返回 None。
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _format_gauge(name: str, value: float):
+    if name.endswith("_bytes"):
+        return f"{name.removesuffix('_bytes')}={value / 2**20:.1f}MiB"
+    return f"{name}={value:g}"
+
+
+def _escape(value: str):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    指标的注册表。耗时和计数可以在工作线程中记录，由锁保护。
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.timers: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self.peaks: dict[str, int] = {}
+        self._tracing = 0
+        self._started_tracing = False
+        self.gauges: dict[str, Callable[[], float | None]] = {"process_resident_bytes": resident_bytes}
+        self.collectors: dict[str, Callable[[], Mapping[str, object]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float):
+        """
+        记录阶段 name 的一次耗时。
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.timers.get(name)
+            if histogram is None:
+                histogram = self.timers[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, value: int = 1):
+        """
+        将计数器 name 增加 value。
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timer(self, name: str) -> AbstractContextManager[object]:
+        """
+        返回记录阶段 name 耗时的上下文管理器。
+        """
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def timed(self, name: str | None = None) -> Callable[[F], F]:
+        """
+        记录函数每次调用耗时的装饰器，name 默认为函数名。抛出异常（包括 NoneBot 用于结束处理的异常）
+        的调用同样计入。支持协程函数。
+        """
+
+        def decorator(func: F) -> F:
+            if not self.enabled:
+                return func
+            stage = name or func.__name__
+
+            if inspect.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args: Any, **kwargs: Any):
+                    start = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.observe(stage, time.perf_counter() - start)
+
+                return async_wrapper  # pyright: ignore[reportReturnType]
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(stage, time.perf_counter() - start)
+
+            return wrapper  # pyright: ignore[reportReturnType]
+
+        return decorator
+
+    def traced(self, name: str | None = None) -> Callable[[F], F]:
+        """
+        记录同步函数最近一次调用期间 Python 内存分配峰值的装饰器，以状态量 name_peak_bytes 导出，
+        name 默认为函数名。峰值由 tracemalloc 统计，调用期间内存分配会变慢，只适合数据表加载等
+        低频的后台步骤。tracemalloc 是进程级的，多个被装饰的函数同时运行时（例如并行加载数据表）
+        各自的峰值会包含其他调用的分配。
+        """
+
+        def decorator(func: F) -> F:
+            if not self.enabled:
+                return func
+            stage = name or func.__name__
+            self.gauge(f"{stage}_peak_bytes", functools.partial(self.peaks.get, stage))
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any):
+                base = self._start_tracing()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    peak = self._stop_tracing() - base
+                    with self._lock:
+                        self.peaks[stage] = peak
+
+            return wrapper  # pyright: ignore[reportReturnType]
+
+        return decorator
+
+    def _start_tracing(self):
+        with self._lock:
+            self._tracing += 1
+            if self._tracing == 1:
+                # 外部已经开启了 tracemalloc 时（例如基准测试）不负责停止
+                self._started_tracing = not tracemalloc.is_tracing()
+                if self._started_tracing:
+                    tracemalloc.start()
+                # 只在没有其他调用正在统计时重置峰值，避免抹掉它们的记录
+                tracemalloc.reset_peak()
+            return tracemalloc.get_traced_memory()[0]
+
+    def _stop_tracing(self):
+        with self._lock:
+            peak = tracemalloc.get_traced_memory()[1]
+            self._tracing -= 1
+            if self._tracing == 0 and self._started_tracing:
+                tracemalloc.stop()
+            return peak
+
+    def gauge(self, name: str, func: Callable[[], float | None]):
+        """
+        注册状态量 name，读取指标时调用 func 取值，返回 None 时跳过。
+        """
+        self.gauges[name] = func
+
+    def collector(self, name: str, func: Callable[[], Mapping[str, object]]):
+        """
+        注册组件统计（例如 `SessionManager.stats`），其中的数值以 name_键 的名称导出。
+        """
+        self.collectors[name] = func
+
+    def read_gauges(self):
+        values: dict[str, float] = {}
+        for name, func in self.gauges.items():
+            try:
+                value = func()
+            except Exception:
+                logger.exception(f"读取指标 {name} 失败：")
+                continue
+            if value is not None:
+                values[name] = value
+        return values
+
+    def read_collectors(self):
+        results: dict[str, Mapping[str, object]] = {}
+        for name, func in self.collectors.items():
+            try:
+                results[name] = func()
+            except Exception:
+                logger.exception(f"读取 {name} 统计失败：")
+        return results
+
+    def render_text(self):
+        """
+        返回可以直接回复的指标摘要：各阶段按总耗时从高到低排列的调用次数与耗时分位数、计数器和状态量。
+        """
+        with self._lock:
+            timers = sorted(self.timers.items(), key=lambda item: item[1].sum, reverse=True)
+            rows = [
+                (name, h.count, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99), h.max)
+                for name, h in timers
+            ]
+            counters = sorted(self.counters.items())
+        lines: list[str] = []
+        if rows:
+            lines.append("阶段耗时（次数，p50/p95/p99/最大，毫秒）：")
+            lines += [
+                f"  {name}：{count} 次，{p50 * 1e3:.2f}/{p95 * 1e3:.2f}/{p99 * 1e3:.2f}/{peak * 1e3:.2f}"
+                for name, count, p50, p95, p99, peak in rows
+            ]
+        if counters:
+            lines.append("计数：" + "，".join(f"{name}={value}" for name, value in counters))
+        gauges = [_format_gauge(name, value) for name, value in sorted(self.read_gauges().items())]
+        if gauges:
+            lines.append("状态：" + "，".join(gauges))
+        return "\n".join(lines)
+
+    def render_prometheus(self):
+        """
+        以 Prometheus 文本格式输出所有指标。
+        """
+        lines = [
+            f"# HELP {PREFIX}_stage_seconds 各阶段耗时（秒）",
+            f"# TYPE {PREFIX}_stage_seconds histogram",
+        ]
+        with self._lock:
+            timers = {name: (list(h.counts), h.count, h.sum) for name, h in self.timers.items()}
+            counters = dict(self.counters)
+        for name, (counts, count, total) in sorted(timers.items()):
+            label = f'stage="{_escape(name)}"'
+            cumulative = 0
+            for bound, bucket in zip((*BUCKETS, "+Inf"), counts, strict=True):
+                cumulative += bucket
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{PREFIX}_stage_seconds_sum{{{label}}} {total}")
+            lines.append(f"{PREFIX}_stage_seconds_count{{{label}}} {count}")
+        for name, value in sorted(counters.items()):
+            lines += [f"# TYPE {PREFIX}_{name}_total counter", f"{PREFIX}_{name}_total {value}"]
+        for name, value in sorted(self.read_gauges().items()):
+            lines += [f"# TYPE {PREFIX}_{name} gauge", f"{PREFIX}_{name} {value}"]
+        for group, stats in sorted(self.read_collectors().items()):
+            for key, value in stats.items():
+                # 布尔值和 None（例如尚未构建的映射表）不导出
+                if isinstance(value, int | float) and not isinstance(value, bool):
+                    lines += [f"# TYPE {PREFIX}_{group}_{key} untyped", f"{PREFIX}_{group}_{key} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Path = METRICS_PATH):
+        """
+        将指标原子写入 path，可以由 node_exporter 的 textfile 收集器读取。
+        """
+        _write(path, self.render_prometheus())
+
+    async def dump_periodically(self, interval: float, path: Path = METRICS_PATH):
+        """
+        每隔 interval 秒写出一次指标，直到任务被取消。指标在事件循环中读取，文件在工作线程中写出。
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(_write, path, self.render_prometheus())
+            except OSError:
+                logger.exception("写出性能指标失败：")
+
+
+def _write(path: Path, text: str):
+    with atomic_open(path) as f:
+        _ = f.write(text)
+
+
+metrics = Metrics(conf.metrics_enabled)
@@ -0,0 +1,185 @@
+"""
+数据更新流水线：下载 → 解析 → 合并 → 写入 → 构建索引。
+
+下载使用异步请求，其余阶段在工作线程中执行，不阻塞事件循环。同一时间只运行一次更新；
+更新期间命令继续使用已加载的数据集，尚无可用数据时可以等待就绪事件。
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from nonebot import logger, require
+
+from .ArkSrc import (
+    UpdateReport,
+    check_resource_exists,
+    fetch_and_save_data_async,
+    needs_rebuild,
+    record_merged_inputs,
+)
+from .dataset import datasets, load_dataset, store_dataset
+from .mapping import mapping_registry
+from .profiler import profiler
+from .saveData import process_data, save_to_json
+
+_ = require("nonebot_plugin_localstore")
+
+from nonebot_plugin_localstore import get_plugin_data_dir
+
+DATA_DIR = get_plugin_data_dir()
+
+MERGED_DATA_PATH = DATA_DIR / "merged_character_data.json"
+
+
+@dataclass(slots=True)
+class BuildStatus:
+    """
+    一次更新的进度。阶段由工作线程切换，事件循环只读取，因此只保存简单的值。
+    """
+
+    started_at: float = field(default_factory=time.monotonic)
+    stage: str | None = None
+    stage_started_at: float = 0.0
+    durations: dict[str, float] = field(default_factory=dict)
+    finished_at: float | None = None
+    error: str | None = None
+
+    def enter(self, stage: str):
+        """
+        结束当前阶段并进入下一阶段。
+        """
+        now = time.monotonic()
+        if self.stage is not None:
+            self.durations[self.stage] = now - self.stage_started_at
+        self.stage, self.stage_started_at = stage, now
+        logger.info(f"数据更新进度：{stage}")
+
+    def finish(self, error: BaseException | None = None):
+        now = time.monotonic()
+        if self.stage is not None:
+            self.durations[self.stage] = now - self.stage_started_at
+        self.stage, self.finished_at = None, now
+        if error is not None:
+            self.error = str(error) or type(error).__name__
+
+    @property
+    def running(self):
+        return self.finished_at is None
+
+    def describe(self):
+        """
+        返回可以直接回复给用户的当前进度。
+        """
+        if self.running:
+            elapsed = time.monotonic() - self.started_at
+            return f"当前阶段：{self.stage or '准备中'}（已用时 {elapsed:.1f} 秒）"
+        if self.error is not None:
+            return f"上次更新失败：{self.error}"
+        return f"上次更新已完成。{self.timings()}"
+
+    def timings(self):
+        """
+        返回各阶段耗时。
+        """
+        stages = "，".join(f"{stage} {duration:.1f} 秒" for stage, duration in self.durations.items())
+        return f"各阶段耗时：{stages}。" if stages else ""
+
+
+def rebuild_merged_data(path: Path, status: BuildStatus):
+    """
+    重建映射表，再重新生成合并数据并加载数据集，所有数据表都与上次合并时相同时跳过合并。
+    在工作线程中调用。
+    """
+    status.enter("构建映射表")
+    _ = mapping_registry.build()
+    if not needs_rebuild(path):
+        logger.info("数据表均未变化，跳过合并数据。")
+        return
+    merged_data = process_data(status.enter)
+    status.enter("写入数据文件")
+    save_to_json(merged_data, path)
+    record_merged_inputs()
+    status.enter("构建索引")
+    _ = store_dataset(path, merged_data)
+
+
+class DataPipeline:
+    """
+    串行执行数据更新，并维护数据就绪事件。
+
+    数据文件存在即视为就绪；更新期间数据文件由原子替换写出，旧的数据集仍然可用。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.status: BuildStatus | None = None
+        self._lock = asyncio.Lock()
+        self._ready = asyncio.Event()
+
+    @property
+    def running(self):
+        return self.status is not None and self.status.running
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def describe(self):
+        """
+        返回当前或上次更新的进度说明，从未更新过时返回空字符串。
+        """
+        return "" if self.status is None else self.status.describe()
+
+    def mark_ready(self):
+        if self.path.is_file():
+            self._ready.set()
+
+    async def wait_ready(self):
+        """
+        等待数据就绪，调用方用 `asyncio.timeout` 限制等待时间。
+        """
+        _ = await self._ready.wait()
+
+    @profiler.profiled("update_pipeline")
+    async def run(self, fetch: bool = True) -> UpdateReport | None:
+        """
+        执行一次更新，fetch 为 False 时只用本地数据表重新合并。已有更新在运行时等待其结束后再执行。
+        """
+        async with self._lock:
+            status = self.status = BuildStatus()
+            try:
+                report = None
+                if fetch:
+                    status.enter("下载数据表")
+                    report = await fetch_and_save_data_async()
+                await asyncio.to_thread(rebuild_merged_data, self.path, status)
+            except BaseException as e:
+                status.finish(e)
+                raise
+            else:
+                status.finish()
+            finally:
+                self.mark_ready()
+                profiler.annotate(
+                    fetch=fetch,
+                    dataset_version=datasets.version,
+                    stages={stage: round(duration, 3) for stage, duration in status.durations.items()},
+                    error=status.error,
+                )
+            logger.info(f"数据更新完成。{status.timings()}")
+            return report
+
+    async def warm_up(self):
+        """
+        在工作线程中预先构建映射表并加载数据集，使第一条命令不必等待。
+        """
+        if check_resource_exists():
+            _ = await asyncio.to_thread(mapping_registry.build)
+        if self.path.is_file():
+            _ = await asyncio.to_thread(load_dataset, self.path)
+        self.mark_ready()
+
+
+pipeline = DataPipeline(MERGED_DATA_PATH)
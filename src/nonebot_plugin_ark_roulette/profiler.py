@@ -0,0 +1,318 @@
+"""
+按需启用的性能分析：记录耗时过长或被随机选中的命令处理和数据更新。
+
+设置 `profile_threshold` 或 `profile_sample_rate` 后启用。被分析的调用进行期间，后台线程每隔
+`profile_interval` 秒采样一次所有线程的调用栈，只保留包含插件代码的栈（例如工作线程中的筛选和合并数据）；
+调用耗时超过阈值时保存这些采样。被随机选中的调用另外在事件循环线程上运行 cProfile，
+结果同样保存（同一时间只运行一个 cProfile）。两种方式都会记录到同一时间其他并发调用的活动，
+保存的结果中 concurrent 为期间同时进行的其他调用数。
+
+结果保存在数据目录的 profiles 子目录中，每次分析一个 JSON 文件（调用栈为 flamegraph 的折叠格式），
+cProfile 的结果另存为 .pstats 文件，超过 `profile_keep` 个时删除最旧的结果。未启用时装饰器直接返回原函数。
+"""
+
+import asyncio
+import cProfile
+import functools
+import json
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import FrameType
+from typing import Any, TypeVar
+
+from nonebot import logger, require
+from nonebot.plugin import get_plugin_config
+
+from .config import Config
+
+_ = require("nonebot_plugin_localstore")
+
+from nonebot_plugin_localstore import get_plugin_data_dir
+
+DATA_DIR = get_plugin_data_dir()
+
+PROFILE_DIR = DATA_DIR / "profiles"
+
+PACKAGE_DIR = str(Path(__file__).resolve().parent)
+
+conf = get_plugin_config(Config)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass(slots=True, eq=False)
+class Capture:
+    """
+    一次被分析的调用。
+    """
+
+    stage: str
+    started_at: float = field(default_factory=time.time)
+    start: float = field(default_factory=time.perf_counter)
+    profile: cProfile.Profile | None = None
+    stacks: Counter[str] = field(default_factory=Counter)
+    samples: int = 0
+    concurrent: int = 0
+    info: dict[str, object] = field(default_factory=dict)
+
+
+def collapse(frame: FrameType | None):
+    """
+    将调用栈转换为 flamegraph 的折叠格式（从外到内，以分号分隔），栈中没有插件代码时返回 None。
+    """
+    names: list[str] = []
+    in_package = False
+    while frame is not None:
+        code = frame.f_code
+        in_package = in_package or code.co_filename.startswith(PACKAGE_DIR)
+        names.append(f"{Path(code.co_filename).stem}.{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names)) if in_package else None
+
+
+class StackSampler:
+    """
+    有被分析的调用时定期采样所有线程调用栈的后台线程，没有时阻塞等待，不占用 CPU。
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._captures: dict[int, Capture] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, capture: Capture):
+        with self._lock:
+            for other in self._captures.values():
+                other.concurrent += 1
+            capture.concurrent = len(self._captures)
+            self._captures[id(capture)] = capture
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ark-roulette-sampler", daemon=True)
+                self._thread.start()
+            self._wakeup.set()
+
+    def remove(self, capture: Capture):
+        with self._lock:
+            _ = self._captures.pop(id(capture), None)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._captures:
+                    self._wakeup.clear()
+            if not self._wakeup.is_set():
+                _ = self._wakeup.wait()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()  # pyright: ignore[reportPrivateUsage]
+            stacks = [collapse(frame) for ident, frame in frames.items() if ident != me]
+            del frames
+            with self._lock:
+                for capture in self._captures.values():
+                    capture.samples += 1
+                    capture.stacks.update(stack for stack in stacks if stack is not None)
+
+
+def _profile_top(profile: cProfile.Profile, limit: int = 10):
+    stats = pstats.Stats(profile).stats  # pyright: ignore[reportAttributeAccessIssue]
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{Path(filename).stem}:{lineno}({name})",
+            "calls": calls,
+            "tottime": tottime,
+            "cumtime": cumtime,
+        }
+        for (filename, lineno, name), (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+def _hot_functions(stacks: Counter[str], limit: int = 10):
+    leaves: Counter[str] = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return leaves.most_common(limit)
+
+
+class Profiler:
+    """
+    决定哪些调用需要分析，并保存和读取分析结果。
+    """
+
+    def __init__(
+        self,
+        threshold: float | None,
+        sample_rate: float,
+        interval: float,
+        keep: int,
+        directory: Path = PROFILE_DIR,
+    ):
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.directory = directory
+        self.enabled = threshold is not None or sample_rate > 0
+        self.sampler = StackSampler(interval)
+        self._current: ContextVar[Capture | None] = ContextVar("profile_capture", default=None)
+        self._profiling = False
+        self._save_lock = threading.Lock()
+        self._sequence = 0
+
+    def profiled(self, stage: str | None = None) -> Callable[[F], F]:
+        """
+        分析协程函数调用的装饰器，stage 默认为函数名。未启用时直接返回原函数。
+        """
+
+        def decorator(func: F) -> F:
+            if not self.enabled:
+                return func
+            name = stage or func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any):
+                capture = self._begin(name)
+                token = self._current.set(capture)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self._current.reset(token)
+                    self._end(capture)
+
+            return wrapper  # pyright: ignore[reportReturnType]
+
+        return decorator
+
+    def annotate(self, **info: object):
+        """
+        为当前被分析的调用附加信息（例如查询内容、数据集版本、结果数量），不在分析中时什么也不做。
+        """
+        if not self.enabled:
+            return
+        capture = self._current.get()
+        if capture is not None:
+            capture.info.update(info)
+
+    def _begin(self, stage: str):
+        capture = Capture(stage)
+        if not self._profiling and random.random() < self.sample_rate:
+            self._profiling = True
+            capture.profile = cProfile.Profile()
+            capture.profile.enable()
+        self.sampler.add(capture)
+        return capture
+
+    def _end(self, capture: Capture):
+        duration = time.perf_counter() - capture.start
+        self.sampler.remove(capture)
+        if capture.profile is not None:
+            capture.profile.disable()
+            self._profiling = False
+            reason = "sampled"
+        elif self.threshold is not None and duration >= self.threshold:
+            reason = "slow"
+        else:
+            return
+        logger.info(f"{capture.stage} 耗时 {duration * 1e3:.0f} 毫秒，已记录性能分析（{reason}）。")
+        _ = asyncio.get_running_loop().run_in_executor(None, self._save, capture, duration, reason)
+
+    def _save(self, capture: Capture, duration: float, reason: str):
+        try:
+            with self._save_lock:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._sequence += 1
+                stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(capture.started_at))
+                base = f"{stamp}-{self._sequence:04d}-{capture.stage}-{duration * 1e3:.0f}ms"
+                record: dict[str, object] = {
+                    "stage": capture.stage,
+                    "started_at": capture.started_at,
+                    "duration": duration,
+                    "reason": reason,
+                    "info": capture.info,
+                    "concurrent": capture.concurrent,
+                    "samples": capture.samples,
+                    "hot": _hot_functions(capture.stacks),
+                    "stacks": dict(capture.stacks.most_common()),
+                    "profile": None,
+                    "profile_top": [],
+                }
+                if capture.profile is not None:
+                    capture.profile.dump_stats(self.directory / f"{base}.pstats")
+                    record["profile"] = f"{base}.pstats"
+                    record["profile_top"] = _profile_top(capture.profile)
+                _ = (self.directory / f"{base}.json").write_text(
+                    json.dumps(record, ensure_ascii=False, default=str), "utf-8"
+                )
+                self._rotate()
+        except (OSError, TypeError, ValueError):
+            logger.exception("保存性能分析结果失败：")
+
+    def _rotate(self):
+        captures = sorted(self.directory.glob("*.json"), key=lambda path: path.stat().st_mtime_ns)
+        for path in captures[: max(0, len(captures) - self.keep)]:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".pstats").unlink(missing_ok=True)
+
+    def captures(self):
+        """
+        读取保存的分析结果，按耗时从高到低排列。
+        """
+        records: list[dict[str, Any]] = []
+        for path in self.directory.glob("*.json"):
+            try:
+                record = json.loads(path.read_text("utf-8"))
+            except (OSError, ValueError):
+                continue
+            record["name"] = path.stem
+            records.append(record)
+        records.sort(key=lambda record: record.get("duration", 0), reverse=True)
+        return records
+
+
+def describe_capture(record: dict[str, Any]):
+    """
+    返回分析结果的一行摘要：时间、阶段、耗时、记录原因和附加信息。
+    """
+    started = time.strftime("%m-%d %H:%M:%S", time.localtime(record.get("started_at", 0)))
+    info = "，".join(f"{key}={value}" for key, value in (record.get("info") or {}).items())
+    duration = record.get("duration", 0) * 1e3
+    text = f"{started} {record.get('stage')} {duration:.0f} 毫秒（{record.get('reason')}）"
+    if info:
+        text += f" {info}"
+    if concurrent := record.get("concurrent"):
+        text += f"，期间另有 {concurrent} 个调用"
+    return text
+
+
+def capture_details(record: dict[str, Any]):
+    """
+    返回分析结果的详情：采样最多的函数及其占比，以及 cProfile 累计耗时最高的函数。
+    """
+    lines = [describe_capture(record), f"文件：{record['name']}.json"]
+    samples = record.get("samples") or 0
+    if samples and record.get("hot"):
+        lines.append(f"调用栈采样（共 {samples} 次，栈顶函数）：")
+        lines += [f"  {name}：{count / samples:.0%}" for name, count in record["hot"]]
+    if record.get("profile_top"):
+        lines.append("cProfile（累计耗时，毫秒）：")
+        lines += [
+            f"  {row['function']}：{row['cumtime'] * 1e3:.1f}"
+            f"（自身 {row['tottime'] * 1e3:.1f}，{row['calls']} 次）"
+            for row in record["profile_top"]
+        ]
+    return lines
+
+
+profiler = Profiler(
+    conf.profile_threshold, conf.profile_sample_rate, conf.profile_interval, conf.profile_keep
+)
@@ -0,0 +1,381 @@
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from .attributes import NUMERIC_ATTRIBUTES
+from .columns import CATEGORICAL_FIELDS, MULTI_VALUED_FIELDS
+from .dataset import Dataset
+from .mapping import BASIC_ARCHIVES, FIELD_MAPPING, RARITY_MAPPING, load_mappings, resolve_keyword
+from .metrics import metrics
+
+
+class QuerySyntaxError(ValueError):
+    """
+    筛选条件无法解析时抛出，消息可以直接回复给用户。
+    """
+
+
+RECORD_FIELDS = frozenset(value for key, value in FIELD_MAPPING.items() if not key.isascii())
+"""干员数据中可以按字段筛选的字段名"""
+
+STORY_FIELDS = frozenset(value for key, value in BASIC_ARCHIVES.items() if not key.isascii())
+"""干员档案（stories）中可以按字段筛选的字段名"""
+
+CODED_FIELDS = frozenset(
+    ("profession", "rarity", "position", "nationId", "groupId", "teamId", "subProfessionId")
+)
+"""取值为游戏内部 ID 的字段，筛选值需要先经过映射表转换"""
+
+ORDERED_OPERATORS = frozenset(("<", "<=", ">", ">="))
+
+_TERM_PATTERN = re.compile(r"^(?P<field>[^=<>!:]+?)(?P<op>>=|<=|!=|=|>|<|:)(?P<value>.+)$")
+
+
+def resolve_field(name: str):
+    """
+    将字段名（中文或英文）解析为 (字段名, 是否为档案字段)，无法识别时返回 None。
+    """
+    if name in RECORD_FIELDS:
+        return name, False
+    if name in STORY_FIELDS:
+        return name, True
+    if (field := FIELD_MAPPING.get(name)) in RECORD_FIELDS:
+        return field, False
+    if (field := BASIC_ARCHIVES.get(name)) in STORY_FIELDS:
+        return field, True
+    return None
+
+
+def normalize_value(field: str, value: str):
+    """
+    将用户输入的筛选值转换为数据中实际保存的取值，例如 狙击 -> SNIPER、5 -> TIER_5。
+    """
+    if field not in CODED_FIELDS:
+        return value
+    if field == "rarity":
+        if value.isdigit():
+            return f"TIER_{value}"
+        if value in RARITY_MAPPING:
+            return RARITY_MAPPING[value]
+        if f"{value}星" in RARITY_MAPPING:
+            return RARITY_MAPPING[f"{value}星"]
+    if value.isascii():
+        return value
+    return load_mappings().get(value, value)
+
+
+@dataclass(frozen=True, slots=True)
+class TextTerm:
+    """
+    未指定字段的关键词，在干员全文中做子串匹配。
+    """
+
+    keyword: str
+    mapped: str
+    candidates: tuple[str, ...] = ()
+
+    @property
+    def cache_key(self):
+        return ("text", self.mapped)
+
+    def evaluate(self, dataset: Dataset) -> int:
+        return dataset.search(self.mapped)
+
+    def terms(self) -> Iterator["Term"]:
+        yield self
+
+    def __str__(self):
+        return self.keyword
+
+
+@dataclass(frozen=True, slots=True)
+class FieldTerm:
+    """
+    限定字段的筛选条件，只访问对应字段的列或取值索引。
+    """
+
+    source: str
+    field: str
+    in_stories: bool
+    op: str
+    value: str
+    raw_value: str
+
+    def _contains(self, value: str | None):
+        if value is None:
+            return False
+        return (
+            self.value in value
+            or self.raw_value in value
+            or self.raw_value in load_mappings().get(value, "")
+        )
+
+    @property
+    def cache_key(self):
+        return ("field", self.field, self.in_stories, self.op, self.value, self.raw_value)
+
+    def evaluate(self, dataset: Dataset) -> int:
+        if not self.in_stories and self.field in (*CATEGORICAL_FIELDS, *MULTI_VALUED_FIELDS):
+            columns = dataset.columns
+            if self.op == ":":
+                values = (
+                    columns.tags if self.field in MULTI_VALUED_FIELDS else columns.dictionaries[self.field]
+                )
+                return columns.to_bitmap(columns.isin(self.field, filter(self._contains, values)))
+            return columns.to_bitmap(columns.compare(self.field, self.op, self.value))
+
+        values = dataset.field_values(self.field, self.in_stories)
+        if self.op in ("=", "=="):
+            return values.get(self.value, 0)
+        if self.op == "!=":
+            return dataset.full_mask & ~values.get(self.value, 0)
+        mask = 0
+        for value, bitmap in values.items():
+            if self._contains(value):
+                mask |= bitmap
+        return mask
+
+    def terms(self) -> Iterator["Term"]:
+        yield self
+
+    def __str__(self):
+        return self.source
+
+
+@dataclass(frozen=True, slots=True)
+class RangeTerm:
+    """
+    数值字段的比较条件，在有序索引上二分查找，例如 身高>170、生日=12月。
+
+    low 和 high 为筛选值对应的闭区间，只有月份的生日对应整个月。
+    """
+
+    source: str
+    field: str
+    op: str
+    low: float
+    high: float
+
+    @property
+    def cache_key(self):
+        return ("range", self.field, self.op, self.low, self.high)
+
+    def evaluate(self, dataset: Dataset) -> int:
+        index = dataset.attributes[self.field]
+        if self.op == "!=":
+            return dataset.full_mask & ~index.between(self.low, self.high)
+        return index.compare(self.op, self.low, self.high)
+
+    def terms(self) -> Iterator["Term"]:
+        yield self
+
+    def __str__(self):
+        return self.source
+
+
+Term = TextTerm | FieldTerm | RangeTerm
+
+
+def compile_term(source: str) -> Term:
+    """
+    将单个筛选词编译为筛选条件。
+
+    `字段<运算符>值` 形式且字段可识别时编译为 `FieldTerm`，运算符支持
+    `=`、`!=` 和表示包含的 `:`；其余情况按全文关键词处理。
+    数值字段（见 `NUMERIC_ATTRIBUTES`）的比较编译为 `RangeTerm`，只有数值字段支持
+    `>`、`>=`、`<`、`<=`，其他字段使用时抛出 `QuerySyntaxError`。
+    """
+    match = _TERM_PATTERN.match(source)
+    resolved = resolve_field(match["field"]) if match else None
+    if match is None or resolved is None:
+        mapped, candidates = resolve_keyword(source)
+        return TextTerm(source, mapped, tuple(candidates))
+
+    field, in_stories = resolved
+    op = match["op"]
+    raw_value = match["value"]
+    attribute = NUMERIC_ATTRIBUTES.get(field)
+    if attribute is not None and attribute.in_stories == in_stories and op != ":":
+        bounds = attribute.parse_query(raw_value)
+        if bounds is not None:
+            return RangeTerm(source, field, op, *bounds)
+        if op in ORDERED_OPERATORS:
+            raise QuerySyntaxError(
+                f"无法将 '{raw_value}' 解析为{attribute.label}，例如 {attribute.example}"
+            )
+    if op in ORDERED_OPERATORS:
+        raise QuerySyntaxError(f"字段 '{match['field']}' 不支持大小比较")
+    return FieldTerm(source, field, in_stories, op, normalize_value(field, raw_value), raw_value)
+
+
+@dataclass(frozen=True, slots=True)
+class AndNode:
+    """
+    所有子条件的交集，对应以空格分隔的多个条件。
+    """
+
+    children: tuple["Node", ...]
+
+    def evaluate(self, dataset: Dataset) -> int:
+        mask = dataset.full_mask
+        for child in self.children:
+            mask &= evaluate(child, dataset)
+            if not mask:
+                break
+        return mask
+
+    def terms(self) -> Iterator[Term]:
+        for child in self.children:
+            yield from child.terms()
+
+    def __str__(self):
+        return " ".join(
+            f"({child})" if isinstance(child, OrNode) else str(child) for child in self.children
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class OrNode:
+    """
+    子条件的并集，对应 `狙击|术师`。
+    """
+
+    children: tuple["Node", ...]
+
+    def evaluate(self, dataset: Dataset) -> int:
+        mask = 0
+        for child in self.children:
+            mask |= evaluate(child, dataset)
+        return mask
+
+    def terms(self) -> Iterator[Term]:
+        for child in self.children:
+            yield from child.terms()
+
+    def __str__(self):
+        return "|".join(
+            f"({child})" if isinstance(child, AndNode) else str(child) for child in self.children
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class NotNode:
+    """
+    子条件在完整数据集中的补集，对应 `!男`。
+    """
+
+    child: "Node"
+
+    def evaluate(self, dataset: Dataset) -> int:
+        return dataset.full_mask & ~evaluate(self.child, dataset)
+
+    def terms(self) -> Iterator[Term]:
+        yield from self.child.terms()
+
+    def __str__(self):
+        child = self.child
+        return f"!({child})" if isinstance(child, AndNode | OrNode) else f"!{child}"
+
+
+Node = Term | AndNode | OrNode | NotNode
+
+
+def evaluate(node: Node, dataset: Dataset) -> int:
+    """
+    计算条件在数据集上的干员位图，单个条件的结果缓存在数据集中，数据集更新后自然失效。
+    """
+    if isinstance(node, TextTerm | FieldTerm | RangeTerm):
+        return dataset.cached_term(node.cache_key, lambda: node.evaluate(dataset))
+    return node.evaluate(dataset)
+
+
+def canonical(node: Node) -> str:
+    """
+    返回条件的规范形式：单个条件取其缓存键，交集和并集的子条件排序，
+    因此 `狙击|术师` 与 `术师|狙击`、`六星` 与 `6星` 得到相同的结果。
+    """
+    if isinstance(node, TextTerm | FieldTerm | RangeTerm):
+        return repr(node.cache_key)
+    if isinstance(node, NotNode):
+        return f"!({canonical(node.child)})"
+    op = "&" if isinstance(node, AndNode) else "|"
+    return f"{op}({','.join(sorted(canonical(child) for child in node.children))})"
+
+
+def conjuncts(node: Node) -> tuple[Node, ...]:
+    """
+    将条件拆分为求交集的各个部分，例如 `六星 狙击 男` 拆分为三个条件。
+    """
+    return node.children if isinstance(node, AndNode) else (node,)
+
+
+_TOKEN_PATTERN = re.compile(r"\s+|[()|]|[^\s()|]+")
+
+
+class _Parser:
+    """
+    筛选条件的递归下降解析器，语法如下（优先级从低到高）：
+
+        sequence := or_expr (or_expr)*        以空格分隔，求交集
+        or_expr  := unary ("|" unary)*         求并集
+        unary    := "!" unary | "(" sequence ")" | term
+    """
+
+    def __init__(self, text: str):
+        self.tokens = [token for token in _TOKEN_PATTERN.findall(text) if not token.isspace()]
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def parse(self) -> Node:
+        node = self.sequence()
+        if self.peek() is not None:
+            raise QuerySyntaxError("括号不匹配，多出了 ')'")
+        return node
+
+    def sequence(self) -> Node:
+        children: list[Node] = []
+        while self.peek() not in (None, ")"):
+            children.append(self.or_expr())
+        if not children:
+            raise QuerySyntaxError("括号中缺少筛选条件")
+        return children[0] if len(children) == 1 else AndNode(tuple(children))
+
+    def or_expr(self) -> Node:
+        children = [self.unary()]
+        while self.peek() == "|":
+            self.pos += 1
+            children.append(self.unary())
+        return children[0] if len(children) == 1 else OrNode(tuple(children))
+
+    def unary(self) -> Node:
+        token = self.peek()
+        if token is None or token in ("|", ")"):
+            raise QuerySyntaxError("'|' 或 '!' 后缺少筛选条件")
+        self.pos += 1
+        if token == "(":
+            node = self.sequence()
+            if self.peek() != ")":
+                raise QuerySyntaxError("括号不匹配，缺少 ')'")
+            self.pos += 1
+            return node
+        return self.word(token)
+
+    def word(self, token: str) -> Node:
+        if not token.startswith("!"):
+            return compile_term(token)
+        if token == "!":
+            return NotNode(self.unary())
+        return NotNode(self.word(token[1:]))
+
+
+@metrics.timed()
+def compile_query(text: str) -> Node:
+    """
+    将筛选条件编译为条件树。
+
+    以空格分隔的条件求交集，`a|b` 求并集，`!a` 求补集，可以用括号分组，
+    例如 `(狙击|术师) !男 稀有度>=5`。
+    """
+    return _Parser(text).parse()
@@ -1,17 +1,19 @@
 import asyncio
 import json
 import os
+from collections.abc import Callable
 from concurrent.futures import ThreadPoolExecutor
-from copy import deepcopy
 from pathlib import Path
 
 from nonebot import require
 
-from .handbook import load_handbook, retrieve_info
-from .mapping import load_team_sub_mapping
-from .schemas import CharacterInfo, FormattedSkinData, MergedMapping
+from .handbook import load_archives
+from .index import iter_bits
+from .mapping import mapping_registry
+from .metrics import metrics
+from .schemas import BareFormattedSkinData, CharacterInfo, FormattedSkinData, MergedMapping
 from .skin import load_skin_data as load_skin_data
-from .utils import require_json
+from .utils import atomic_open, project_json
 
 _ = require("nonebot_plugin_localstore")
 
@@ -19,8 +21,13 @@ from nonebot_plugin_localstore import get_plugin_data_dir
 
 DATA_DIR = get_plugin_data_dir()
 
+CHARACTER_FIELDS = tuple(CharacterInfo.__annotations__)
+"""从 character_table.json 中读取的字段"""
 
-@require_json(DATA_DIR / "character_table.json")
+
+@metrics.timed()
+@metrics.traced()
+@project_json(DATA_DIR / "character_table.json", fields=CHARACTER_FIELDS)
 def load_character_data(character_data: dict[str, CharacterInfo]):
     """
     从 character_table.json 数据中提取角色数据。
@@ -47,29 +54,44 @@ def load_character_data(character_data: dict[str, CharacterInfo]):
     return formatted_data
 
 
+@metrics.timed()
 def load_handbook_data():
     """
     从 handbook_info_table.json 文件中提取 handbookDict 表下的 storyTitle 和 storyText 数据，
     并根据指定的关键字提取信息。
+
+    每个关键字取基础档案中第一个包含它的行。每行只扫描一次：枚举行内与关键字等长的子串并查表，
+    结果与对每个关键字逐行调用 retrieve_info 相同。
     """
-    mappings = load_team_sub_mapping()
-    handbook_stories = load_handbook()
+    snapshot = mapping_registry.snapshot()
+    mappings = snapshot.team_sub_mapping
+    keys = snapshot.team_sub_index
     formatted_data: dict[str, dict[str, str]] = {key: {} for key in mappings}
 
-    # 遍历每个角色的故事数据
-    for char_id, _ in handbook_stories.items():
-        # 提取关键信息
-        for key in mappings.keys():
-            info = retrieve_info(handbook_stories, char_id, "基础档案", key)
+    # 遍历每个角色的基础档案
+    for char_id, sections in load_archives().items():
+        section = sections.get("基础档案")
+        if section is None:
+            continue
+
+        # 记录每个关键字第一次出现的行
+        first_lines: dict[int, str] = {}
+        for line in section.lines:
+            for position in iter_bits(keys.contained_in(line)):
+                _ = first_lines.setdefault(position, line)
+
+        # 按映射表顺序写入，同一映射结果以靠后的关键字为准
+        for position in sorted(first_lines):
+            info = first_lines[position].split("】")[-1].strip()
             if info:
-                # 使用映射表映射关键词
+                key = keys.keys[position]
                 mapped_key = mappings.get(key, key)  # 使用映射表映射关键词
-                # 确保 mapped_key 存在于 formatted_data 中
                 formatted_data.setdefault(mapped_key, {})[char_id] = info
 
     return formatted_data
 
 
+@metrics.timed()
 def merge_data(
     character_data: dict[str, CharacterInfo],
     handbook_data: dict[str, dict[str, str]],
@@ -77,30 +99,14 @@ def merge_data(
 ):
     """
     合并角色数据、角色档案和皮肤数据。
-    """
-    merged_data: dict[str, MergedMapping] = {}
 
-    for char_id, char_info in character_data.items():
-        # 初始化角色数据
-        merged_data[char_id] = {
-            **deepcopy(char_info),
-            "skins": [],
-            "stories": {
-                key: data[char_id] for key, data in handbook_data.items() if char_id in data
-            }
-        }
-
-        # # 添加 handbook_data 中的关键信息
-        # merged_data[char_id]["stories"] = {
-        #     key: data[char_id] for key, data in handbook_data.items() if char_id in data
-        # }
-        # # old implementation
-        # for key, data in handbook_data.items():
-        #     if char_id in data:
-        #         merged_data[char_id][key] = data[char_id]
-
-        # 添加 skin_data 中的皮肤信息
-        merged_data[char_id]["skins"] = [
+    先按角色分组皮肤数据、按角色转置档案数据，再逐个角色拼装，
+    每张表只遍历一次，总耗时与各表大小之和成正比。
+    """
+    # 按 charId 分组皮肤数据，保持皮肤在原表中的顺序
+    skins_by_char: dict[str, list[BareFormattedSkinData]] = {}
+    for skin_info in skin_data.values():
+        skins_by_char.setdefault(skin_info.get("charId"), []).append(
             {
                 "skinId": skin_info.get("skinId"),
                 "modelName": skin_info.get("modelName"),
@@ -109,25 +115,41 @@ def merge_data(
                 "drawerList": skin_info.get("drawerList"),
                 "designerList": skin_info.get("designerList"),
             }
-            for _, skin_info in skin_data.items()
-            if skin_info.get("charId") == char_id
-        ]
+        )
+
+    # 将 {关键词: {角色: 信息}} 转置为 {角色: {关键词: 信息}}，保持关键词顺序
+    stories_by_char: dict[str, dict[str, str]] = {}
+    for key, data in handbook_data.items():
+        for char_id, info in data.items():
+            stories_by_char.setdefault(char_id, {})[key] = info
+
+    merged_data: dict[str, MergedMapping] = {}
+    for char_id, char_info in character_data.items():
+        merged_data[char_id] = {
+            **char_info,
+            "skins": skins_by_char.get(char_id, []),
+            "stories": stories_by_char.get(char_id, {}),
+        }
 
     return merged_data
 
 
+@metrics.timed()
 def save_to_json(data: object, output_path: str | Path):
     """
-    将数据保存到 JSON 文件中。
+    将数据保存到 JSON 文件中。先写入临时文件再替换，写入过程中读取方仍能读到旧文件。
     """
-    with open(output_path, "w", encoding="utf-8") as f:
+    with atomic_open(output_path) as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
 
-def process_data():
+@metrics.timed()
+def process_data(progress: Callable[[str], None] | None = None):
     """
-    使用多线程加载和处理数据。
+    使用多线程加载和处理数据。progress 在进入每个阶段时以阶段名称调用。
     """
+    if progress is not None:
+        progress("解析数据表")
     with ThreadPoolExecutor() as executor:
         # 提交任务到线程池
         future_character = executor.submit(load_character_data)
@@ -140,20 +162,17 @@ def process_data():
         skin_data = future_skin.result()
 
     # 合并数据
+    if progress is not None:
+        progress("合并数据")
     merged_data = merge_data(character_data, handbook_data, skin_data)
     return merged_data
 
 
-async def process_data_async():
-    character_data, handbook_data, skin_data = await asyncio.gather(
-        asyncio.to_thread(load_character_data),
-        asyncio.to_thread(load_handbook_data),
-        asyncio.to_thread(load_skin_data)
-    )
-
-    # 合并数据
-    merged_data = merge_data(character_data, handbook_data, skin_data)
-    return merged_data
+async def process_data_async(progress: Callable[[str], None] | None = None):
+    """
+    在工作线程中加载和合并数据，合并也不占用事件循环。
+    """
+    return await asyncio.to_thread(process_data, progress)
 
 
 # 示例调用
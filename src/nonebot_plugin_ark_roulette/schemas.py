@@ -92,3 +92,24 @@ class CharacterInfo(TypedDict):
 class MergedMapping(CharacterInfo):
     skins: list[BareFormattedSkinData]
     stories: dict[str, str]
+
+
+class TableManifest(TypedDict):
+    etag: str | None
+    last_modified: str | None
+    size: int
+    sha256: str
+    source: str
+    fetched_at: float
+
+
+class SourceStats(TypedDict):
+    latency: float
+    samples: int
+    failures: int
+
+
+class Manifest(TypedDict):
+    tables: dict[str, TableManifest]
+    merged_inputs: dict[str, str]
+    sources: dict[str, SourceStats]
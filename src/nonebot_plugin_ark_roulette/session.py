@@ -0,0 +1,436 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field
+
+from nonebot import logger
+
+from .dataset import Dataset
+from .index import iter_bits
+from .session_store import SessionStore, StoredSession
+
+
+@dataclass(slots=True)
+class FilterSession:
+    """
+    单个用户的筛选会话。
+
+    筛选结果和撤销历史都以干员序号位图保存，完整数据由 `dataset` 共享。
+    chain 为得到当前结果所叠加的条件序列，用作共享结果缓存的键；为 None 时表示未知。
+    """
+
+    dataset: Dataset
+    mask: int
+    history: list[int] = field(default_factory=list)
+    chain: tuple[str, ...] | None = ()
+    chains: list[tuple[str, ...] | None] = field(default_factory=list)
+
+    @classmethod
+    def start(cls, dataset: Dataset):
+        return cls(dataset, dataset.full_mask)
+
+    def reset(self, dataset: Dataset):
+        """
+        将筛选结果重置为完整数据集。
+        """
+        self.dataset = dataset
+        self.mask = dataset.full_mask
+        self.history.clear()
+        self.chain = ()
+        self.chains.clear()
+
+    def push(self, mask: int, chain: tuple[str, ...] | None = None):
+        """
+        记录当前结果以便撤销，并切换到新的筛选结果。
+        """
+        self.history.append(self.mask)
+        self.chains.append(self.chain)
+        self.mask = mask
+        self.chain = chain
+
+    def undo(self):
+        """
+        撤销上一次筛选，没有可撤销的操作时返回 False。
+        """
+        if not self.history:
+            return False
+        self.mask = self.history.pop()
+        self.chain = self.chains.pop()
+        return True
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def dump(self, expires_at: float, updated_at: float):
+        """
+        转换为持久化形式，位图按数据集的干员数编码为定长字节串。
+        """
+        width = (len(self.dataset) + 7) // 8
+        return StoredSession(
+            self.dataset.fingerprint,
+            self.mask.to_bytes(width, "little"),
+            b"".join(mask.to_bytes(width, "little") for mask in self.history),
+            expires_at,
+            updated_at,
+        )
+
+    @classmethod
+    def restore(cls, stored: StoredSession, dataset: Dataset, ids: Sequence[str] | None):
+        """
+        在 dataset 上恢复会话。指纹不同时按 ids（保存时数据集的干员 ID 序列）换算位图，
+        已不存在的干员会被丢弃；无法换算时返回 None。
+        """
+        if stored.fingerprint == dataset.fingerprint:
+            ids, translate = dataset.ids, None
+        elif ids is not None:
+            positions = dataset.index.positions
+            translate = [positions.get(char_id) for char_id in ids]
+        else:
+            return None
+
+        width = (len(ids) + 7) // 8
+
+        def decode(data: bytes):
+            mask = int.from_bytes(data, "little")
+            if translate is None:
+                return mask
+            result = 0
+            for i in iter_bits(mask):
+                if (position := translate[i]) is not None:
+                    result |= 1 << position
+            return result
+
+        history = [decode(stored.history[i : i + width]) for i in range(0, len(stored.history), width)]
+        # 条件序列不持久化，恢复的会话不使用共享结果缓存
+        return cls(dataset, decode(stored.mask), history, None, [None] * len(history))
+
+
+class SessionNotReady(Exception):
+    """
+    存储中有用户的会话，但用于恢复会话的数据集尚不可用。
+    """
+
+
+Notify = Callable[[str], Awaitable[object]]
+"""会话过期时用于提醒用户的回调，参数为提醒内容"""
+
+
+@dataclass(slots=True)
+class _Entry:
+    session: FilterSession
+    deadline: float
+    updated_at: float
+    notify: Notify | None = None
+
+
+class SessionManager:
+    """
+    所有用户的筛选会话。
+
+    会话按最近使用的顺序保存在 OrderedDict 中，所有会话的有效期相同，因此这个顺序也是过期时间的顺序：
+    续期只需移到末尾，单个清理任务只需检查开头的会话，不必为每个用户创建定时任务。
+    会话数超过上限时淘汰最久未使用的会话。
+
+    不指定 store 时会话只保存在内存中。指定 store 时会话的修改先在内存中生效，每隔 flush_interval 秒
+    在工作线程中批量写入 store；store 可能被其他进程修改时，`fetch` 会先在工作线程中检查 store 中
+    是否有更新的版本，本进程没有的会话会从 store 中恢复到 resolve 返回的数据集上，恢复同样受会话数上限约束；
+    数据集尚不可用时 `fetch` 抛出 `SessionNotReady`。
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_sessions: int,
+        store: SessionStore | None = None,
+        flush_interval: float = 1.0,
+        resolve: Callable[[], Awaitable[Dataset | None]] | None = None,
+    ):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.store = store
+        self.flush_interval = flush_interval
+        self.resolve = resolve
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._sweeper: asyncio.Task[None] | None = None
+        self._dirty: set[str] = set()
+        self._pending: dict[str, StoredSession | None] = {}
+        self._pending_datasets: dict[str, Sequence[str]] = {}
+        self._saving: dict[str, StoredSession | None] = {}
+        self._flusher: asyncio.Task[None] | None = None
+        self._known_datasets: set[str] = set()
+        self.created = 0
+        self.restored = 0
+        self.expired = 0
+        self.evicted = 0
+        self.flushes = 0
+
+    def __contains__(self, user_id: str):
+        return user_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id: str):
+        """
+        返回本进程内存中用户的会话，不存在时返回 None，不读取 store，不续期。
+        """
+        entry = self._entries.get(user_id)
+        return None if entry is None else entry.session
+
+    def _is_current(self, user_id: str):
+        # 内存中的版本一定是最新的：没有 store、有未写入的修改，或 store 只由本进程使用
+        store = self.store
+        return store is None or user_id in self._dirty or (user_id in self._entries and not store.shared)
+
+    async def fetch(self, user_id: str):
+        """
+        返回用户的会话，必要时从 store 读取更新的版本或恢复会话，不存在时返回 None，不续期。
+        读取 store 在工作线程中进行。store 中有有效的会话但 resolve 没有返回数据集时抛出 `SessionNotReady`。
+        """
+        store = self.store
+        if store is None or self._is_current(user_id):
+            return self.get(user_id)
+
+        unsaved, stored = self._unsaved(user_id)
+        if not unsaved:
+            stored = await asyncio.to_thread(store.load, user_id)
+            if self._is_current(user_id):
+                # 读取期间会话被本进程修改
+                return self.get(user_id)
+            unsaved, pending = self._unsaved(user_id)
+            if unsaved:
+                stored = pending
+
+        entry = self._entries.get(user_id)
+        if stored is None or stored.expires_at <= time.time():
+            if entry is not None:
+                # 会话已在其他进程中结束
+                _ = self._entries.pop(user_id)
+            return None
+        if entry is not None and stored.updated_at <= entry.updated_at:
+            return entry.session
+
+        dataset = await self.resolve() if self.resolve is not None else None
+        if dataset is None:
+            if entry is not None:
+                return entry.session
+            # 存储中的会话仍然有效，不能当作没有会话，否则调用方新建的会话会覆盖它
+            raise SessionNotReady(user_id)
+        if self._is_current(user_id):
+            # 等待数据集期间会话被本进程修改
+            return self.get(user_id)
+        entry = self._entries.get(user_id)
+        if entry is not None and stored.updated_at <= entry.updated_at:
+            return entry.session
+        ids = None
+        if stored.fingerprint != dataset.fingerprint:
+            ids = await asyncio.to_thread(store.dataset_ids, stored.fingerprint)
+            if self._is_current(user_id):
+                return self.get(user_id)
+            entry = self._entries.get(user_id)
+        session = FilterSession.restore(stored, dataset, ids)
+        if session is None:
+            return None
+        # 恢复的会话放在末尾，过期时间也按完整有效期计算，保持按过期时间排序
+        self._entries[user_id] = _Entry(
+            session,
+            time.monotonic() + self.ttl,
+            stored.updated_at,
+            entry.notify if entry is not None else None,
+        )
+        self._entries.move_to_end(user_id)
+        self.restored += 1
+        self._evict()
+        self._ensure_sweeper()
+        return self.get(user_id)
+
+    def _unsaved(self, user_id: str) -> tuple[bool, StoredSession | None]:
+        # 已淘汰或已结束、尚未写入 store 的会话以待写入的版本为准，store 中的版本已经过时
+        for changes in (self._pending, self._saving):
+            if user_id in changes:
+                return True, changes[user_id]
+        return False, None
+
+    def start(self, user_id: str, session: FilterSession):
+        """
+        为用户创建会话，会话数超过上限时淘汰最久未使用的会话。
+        """
+        self._entries[user_id] = _Entry(session, time.monotonic() + self.ttl, time.time())
+        self._entries.move_to_end(user_id)
+        self.created += 1
+        self._mark_dirty(user_id)
+        self._evict()
+        self._ensure_sweeper()
+        return session
+
+    def _evict(self):
+        # 会话数超过上限时淘汰最久未使用的会话
+        while len(self._entries) > self.max_sessions:
+            evicted, entry = self._entries.popitem(last=False)
+            self.evicted += 1
+            if self.store is not None:
+                # 可以持久保存的存储保留被淘汰的会话，之后还能恢复
+                if self.store.persistent:
+                    self._pending[evicted] = self._dump(entry)
+                    dataset = entry.session.dataset
+                    self._pending_datasets[dataset.fingerprint] = dataset.ids
+                else:
+                    self._pending[evicted] = None
+                self._dirty.discard(evicted)
+                self._schedule_flush()
+            logger.debug(f"筛选会话数超过上限，已淘汰用户 {evicted} 的会话。")
+
+    def touch(self, user_id: str, notify: Notify | None = None):
+        """
+        将用户的会话续期并标记为已修改，notify 用于过期时提醒用户。
+        """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        entry.deadline = time.monotonic() + self.ttl
+        entry.updated_at = time.time()
+        if notify is not None:
+            entry.notify = notify
+        self._entries.move_to_end(user_id)
+        self._mark_dirty(user_id)
+        self._ensure_sweeper()
+
+    def pop(self, user_id: str):
+        """
+        结束用户的会话并返回它，不存在时返回 None。
+        """
+        entry = self._entries.pop(user_id, None)
+        self._mark_dirty(user_id)
+        return None if entry is None else entry.session
+
+    def stats(self):
+        """
+        返回会话统计：当前会话数、累计创建数、从存储恢复数、过期数、淘汰数和批量写入次数。
+        """
+        return {
+            "live": len(self._entries),
+            "created": self.created,
+            "restored": self.restored,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "flushes": self.flushes,
+        }
+
+    def _dump(self, entry: _Entry):
+        expires_at = time.time() + (entry.deadline - time.monotonic())
+        return entry.session.dump(expires_at, entry.updated_at)
+
+    def _mark_dirty(self, user_id: str):
+        if self.store is None:
+            return
+        self._dirty.add(user_id)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        # 有未写入的修改时每隔 flush_interval 秒在工作线程中写入一次，写入失败的修改留到下一次重试
+        while self.store is not None and (self._dirty or self._pending):
+            await asyncio.sleep(self.flush_interval)
+            changes, datasets = self._collect()
+            if not changes:
+                continue
+            self._saving = changes
+            try:
+                await asyncio.to_thread(self.store.save, changes, datasets)
+            except Exception:
+                self._save_failed(changes, datasets)
+            else:
+                self._saved(datasets)
+            finally:
+                self._saving = {}
+
+    def _collect(self):
+        """
+        取出待写入的修改。会话在写入时才序列化，同一会话的多次修改只写入一次；
+        取出后到写入完成前产生的修改会留到下一次写入。
+        """
+        changes = self._pending
+        for user_id in self._dirty:
+            entry = self._entries.get(user_id)
+            changes[user_id] = None if entry is None else self._dump(entry)
+        datasets = self._pending_datasets
+        for entry in self._entries.values():
+            dataset = entry.session.dataset
+            if dataset.fingerprint not in self._known_datasets:
+                datasets[dataset.fingerprint] = dataset.ids
+        self._dirty = set()
+        self._pending = {}
+        self._pending_datasets = {}
+        return changes, datasets
+
+    def _saved(self, datasets: dict[str, Sequence[str]]):
+        self._known_datasets.update(datasets)
+        self.flushes += 1
+
+    def _save_failed(self, changes: dict[str, StoredSession | None], datasets: dict[str, Sequence[str]]):
+        logger.exception("保存筛选会话失败：")
+        # 取出之后的修改比失败的这一批新，合并时以之后的修改为准
+        self._pending = {**changes, **self._pending}
+        self._pending_datasets = {**datasets, **self._pending_datasets}
+
+    def flush(self):
+        """
+        在当前线程中立即写入所有修改，只在关闭时使用；运行期间的写入在工作线程中进行。
+        """
+        if self.store is None:
+            return
+        changes, datasets = self._collect()
+        if not changes:
+            return
+        try:
+            self.store.save(changes, datasets)
+        except Exception:
+            self._save_failed(changes, datasets)
+        else:
+            self._saved(datasets)
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def _sweep(self):
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            delay = entry.deadline - time.monotonic()
+            if delay > 0:
+                # 睡眠期间开头的会话可能被续期，醒来后重新检查
+                await asyncio.sleep(delay)
+                continue
+            del self._entries[user_id]
+            if self.store is not None and self.store.shared and user_id not in self._dirty:
+                stored = await asyncio.to_thread(self.store.load, user_id)
+                if user_id in self._entries:
+                    # 读取期间用户开始了新的会话
+                    continue
+                if stored is not None and stored.updated_at > entry.updated_at:
+                    # 会话在其他进程中被续期，只丢弃本进程的副本
+                    continue
+            self._mark_dirty(user_id)
+            self.expired += 1
+            logger.info(f"用户 {user_id} 的筛选会话超时，自动退出筛选模式。")
+            if entry.notify is not None:
+                try:
+                    _ = await entry.notify("由于长时间未操作，已自动退出筛选模式。")
+                except Exception:
+                    logger.exception(f"提醒用户 {user_id} 会话超时失败：")
+
+    def close(self):
+        """
+        停止清理任务，写入未保存的修改并关闭存储，用于插件关闭时。
+        """
+        for task in (self._sweeper, self._flusher):
+            if task is not None:
+                _ = task.cancel()
+        self._sweeper = self._flusher = None
+        self.flush()
+        if self.store is not None:
+            self.store.close()
@@ -0,0 +1,160 @@
+"""
+筛选会话的持久化存储。
+
+会话中的位图按所属数据集的指纹保存为定长字节串，数据集指纹对应的干员 ID 序列单独保存一份，
+数据更新后可以按干员 ID 把旧会话的位图换算到新数据集上，不需要重新解析数据。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+
+
+@dataclass(frozen=True, slots=True)
+class StoredSession:
+    """
+    会话的持久化形式。mask 和 history 为小端定长位图，宽度由数据集的干员数决定；
+    时间均为 Unix 时间戳，多个进程之间可以比较。
+    """
+
+    fingerprint: str
+    mask: bytes
+    history: bytes
+    expires_at: float
+    updated_at: float
+
+
+class SessionStore(Protocol):
+    """
+    会话存储的接口，load、save 和 dataset_ids 会在工作线程中调用。会话只保存在内存中时
+    `SessionManager` 不使用存储。
+
+    shared 为 True 时存储可能被其他进程修改，读取会话时需要以存储中的版本为准；
+    persistent 为 True 时存储在重启后仍然保留，淘汰会话时不必删除存储中的记录。
+    """
+
+    shared: bool
+    persistent: bool
+
+    def load(self, user_id: str) -> StoredSession | None: ...
+
+    def save(
+        self,
+        sessions: Mapping[str, StoredSession | None],
+        datasets: Mapping[str, Sequence[str]],
+    ) -> None:
+        """
+        在一次批量写入中保存会话（None 表示删除）和数据集指纹对应的干员 ID 序列。
+        """
+        ...
+
+    def dataset_ids(self, fingerprint: str) -> Sequence[str] | None: ...
+
+    def close(self) -> None: ...
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    mask BLOB NOT NULL,
+    history BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS datasets (
+    fingerprint TEXT PRIMARY KEY,
+    ids TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class SqliteSessionStore:
+    """
+    本地 SQLite 会话存储，使用 WAL 模式，多个进程可以同时读写同一个数据库文件。
+
+    打开时清理已过期的会话和不再被会话引用的数据集记录。读取可以在工作线程中进行，
+    同一连接上的操作由锁串行执行。
+    """
+
+    shared = True
+    persistent = True
+
+    def __init__(self, path: Path, busy_timeout: float = 1.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=busy_timeout, isolation_level=None, check_same_thread=False
+        )
+        _ = self._conn.execute("PRAGMA journal_mode=WAL")
+        _ = self._conn.execute("PRAGMA synchronous=NORMAL")
+        _ = self._conn.executescript(_SCHEMA)
+        with self._conn:
+            _ = self._conn.execute("BEGIN IMMEDIATE")
+            _ = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+            _ = self._conn.execute(
+                "DELETE FROM datasets WHERE fingerprint NOT IN (SELECT fingerprint FROM sessions)"
+                " AND created_at <= ?",
+                (time.time() - 86400,),
+            )
+
+    def load(self, user_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, mask, history, expires_at, updated_at FROM sessions WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+        return None if row is None else StoredSession(*row)
+
+    def save(
+        self,
+        sessions: Mapping[str, StoredSession | None],
+        datasets: Mapping[str, Sequence[str]],
+    ):
+        now = time.time()
+        with self._lock, self._conn:
+            _ = self._conn.execute("BEGIN IMMEDIATE")
+            _ = self._conn.executemany(
+                "INSERT OR IGNORE INTO datasets VALUES (?, ?, ?)",
+                [(fingerprint, json.dumps(list(ids)), now) for fingerprint, ids in datasets.items()],
+            )
+            _ = self._conn.executemany(
+                "DELETE FROM sessions WHERE user_id = ?",
+                [(user_id,) for user_id, stored in sessions.items() if stored is None],
+            )
+            _ = self._conn.executemany(
+                # 多个进程同时写入同一会话时保留较新的版本
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id) DO UPDATE SET"
+                " fingerprint = excluded.fingerprint, mask = excluded.mask, history = excluded.history,"
+                " expires_at = excluded.expires_at, updated_at = excluded.updated_at"
+                " WHERE excluded.updated_at >= sessions.updated_at",
+                [
+                    (
+                        user_id,
+                        stored.fingerprint,
+                        stored.mask,
+                        stored.history,
+                        stored.expires_at,
+                        stored.updated_at,
+                    )
+                    for user_id, stored in sessions.items()
+                    if stored is not None
+                ],
+            )
+
+    def dataset_ids(self, fingerprint: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ids FROM datasets WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+        return None if row is None else tuple(json.loads(row[0]))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
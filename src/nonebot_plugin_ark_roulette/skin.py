@@ -1,7 +1,8 @@
 from nonebot import require
 
-from .schemas import FormattedSkinData, SkinTable
-from .utils import require_json
+from .metrics import metrics
+from .schemas import CharSkinInfo, FormattedSkinData
+from .utils import project_json
 
 _ = require("nonebot_plugin_localstore")
 
@@ -10,14 +11,26 @@ from nonebot_plugin_localstore import get_plugin_data_dir
 DATA_DIR = get_plugin_data_dir()
 
 
-@require_json(DATA_DIR / "skin_table.json")
-def load_skin_data(skin_data: SkinTable):
+SKIN_FIELDS = (
+    "skinId",
+    "charId",
+    "displaySkin.modelName",
+    "displaySkin.skinGroupName",
+    "displaySkin.content",
+    "displaySkin.drawerList",
+    "displaySkin.designerList",
+)
+"""从 skin_table.json 的 charSkins 表中读取的字段"""
+
+
+@metrics.timed()
+@metrics.traced()
+@project_json(DATA_DIR / "skin_table.json", "charSkins", fields=SKIN_FIELDS)
+def load_skin_data(char_skins: dict[str, CharSkinInfo]):
     """
     从 skin_table.json 文件中提取 charSkins 表下的 charSkins 数据。
     """
 
-    # 提取 charSkins 数据
-    char_skins = skin_data.get("charSkins", {})
     formatted_data: dict[str, FormattedSkinData] = {}
 
     for skin_id, skin_info in char_skins.items():
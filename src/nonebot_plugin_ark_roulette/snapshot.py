@@ -0,0 +1,312 @@
+"""
+合并后干员数据的二进制快照。
+
+文件布局（整数均为小端）：
+
+    头部      magic(8) | 版本 u16 | 段数 u16
+    段目录    每段 名称(16) | 偏移 u64 | 长度 u64 | crc32 u32
+    段数据    ...
+
+meta 与 postings 段在加载时整体读取并校验 crc32；docs、skins、stories 为按干员存放的
+数据块，通过 mmap 访问，只在用到时解码。skins 和 stories 的数据块单独用 zlib 压缩；
+docs 为全文检索使用的小写文本，不压缩，检索时直接在 mmap 上匹配。
+数据块段的 crc32 只覆盖开头的偏移表，每个数据块另有自己的 crc32，在首次访问时校验，
+因此加载时不会读取这些段的内容。
+"""
+
+import json
+import mmap
+import struct
+import zlib
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .attributes import TypedAttributes
+from .index import SearchIndex
+from .schemas import MergedMapping
+from .utils import atomic_open
+
+MAGIC = b"ARKSNAP\x00"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sHH")
+_SECTION = struct.Struct("<16sQQI")
+_COUNT = struct.Struct("<I")
+_OFFSET = struct.Struct("<Q")
+_CRC = struct.Struct("<I")
+
+COLD_FIELDS = ("skins", "stories")
+"""只在需要时解码的字段"""
+
+
+class SnapshotError(ValueError):
+    """
+    快照损坏、版本不符或与数据文件不一致时抛出，调用方应改为读取 JSON 数据文件。
+    """
+
+
+def snapshot_path(path: Path):
+    """
+    返回数据文件对应的快照路径。
+    """
+    return path.with_suffix(".snapshot")
+
+
+def _fingerprint(source: Path):
+    stat = source.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _pack_blobs(blobs: Sequence[bytes], compress: bool):
+    # 数量 | 偏移表 (n+1 个 u64) | crc32 表 (n 个 u32) | 数据
+    if compress:
+        blobs = [zlib.compress(blob) for blob in blobs]
+    offsets = [0]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    table = b"".join(
+        (
+            _COUNT.pack(len(blobs)),
+            *(_OFFSET.pack(offset) for offset in offsets),
+            *(_CRC.pack(zlib.crc32(blob)) for blob in blobs),
+        )
+    )
+    return table, b"".join(blobs)
+
+
+def _pack_postings(index: SearchIndex):
+    width = (len(index.ids) + 7) // 8
+    header = json.dumps(
+        {"width": width, "unigrams": list(index.unigrams), "bigrams": list(index.bigrams)},
+        ensure_ascii=False,
+    ).encode()
+    bitmaps = b"".join(
+        bitmap.to_bytes(width, "little") for bitmap in (*index.unigrams.values(), *index.bigrams.values())
+    )
+    return _COUNT.pack(len(header)) + header + bitmaps
+
+
+def write_snapshot(
+    path: Path,
+    source: Path,
+    records: Mapping[str, MergedMapping],
+    index: SearchIndex,
+    attributes: TypedAttributes,
+):
+    """
+    将数据集写入快照文件，source 为对应的 JSON 数据文件，用于判断快照是否过期。
+    """
+    values = list(records.values())
+    meta = {
+        "source": _fingerprint(source),
+        "ids": list(records),
+        "hot": [
+            {key: value for key, value in record.items() if key not in COLD_FIELDS} for record in values
+        ],
+        "attributes": {
+            field: {"pairs": list(zip(sorted_index.values, sorted_index.positions, strict=True))}
+            for field, sorted_index in attributes.indexes.items()
+        },
+        "failures": attributes.failures,
+    }
+    sections: list[tuple[str, bytes, bytes]] = [
+        ("meta", json.dumps(meta, ensure_ascii=False).encode(), b""),
+        ("postings", _pack_postings(index), b""),
+        ("docs", *_pack_blobs([doc.encode() for doc in index.docs], compress=False)),
+    ]
+    for field in COLD_FIELDS:
+        blobs = [json.dumps(record.get(field), ensure_ascii=False).encode() for record in values]
+        sections.append((field, *_pack_blobs(blobs, compress=True)))
+
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    directory: list[bytes] = []
+    for name, checked, unchecked in sections:
+        length = len(checked) + len(unchecked)
+        directory.append(_SECTION.pack(name.encode(), offset, length, zlib.crc32(checked)))
+        offset += length
+
+    with atomic_open(path, "wb") as f:
+        _ = f.write(_HEADER.pack(MAGIC, VERSION, len(sections)))
+        for entry in directory:
+            _ = f.write(entry)
+        for _, checked, unchecked in sections:
+            _ = f.write(checked)
+            _ = f.write(unchecked)
+
+
+class BlobColumn(Sequence[bytes]):
+    """
+    快照中按干员存放的数据块，按需从 mmap 中切出；每个数据块在首次访问时校验 crc32。
+    """
+
+    def __init__(self, mapped: mmap.mmap, offset: int, name: str, compressed: bool):
+        (self.count,) = _COUNT.unpack_from(mapped, offset)
+        self.name = name
+        self.compressed = compressed
+        self._mapped = mapped
+        self._offsets = offset + _COUNT.size
+        self._crcs = self._offsets + _OFFSET.size * (self.count + 1)
+        self._data = self._crcs + _CRC.size * self.count
+        self._verified = bytearray(self.count)
+        self.table_size = self._data - offset
+
+    def __len__(self):
+        return self.count
+
+    def span(self, i: int):
+        """
+        返回第 i 个数据块在文件中的起止位置。
+        """
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        (start,) = _OFFSET.unpack_from(self._mapped, self._offsets + _OFFSET.size * i)
+        (end,) = _OFFSET.unpack_from(self._mapped, self._offsets + _OFFSET.size * (i + 1))
+        start, end = self._data + start, self._data + end
+        if not self._verified[i]:
+            (crc,) = _CRC.unpack_from(self._mapped, self._crcs + _CRC.size * i)
+            if zlib.crc32(self._mapped[start:end]) != crc:
+                raise SnapshotError(f"快照 {self.name} 段的第 {i} 个数据块校验失败")
+            self._verified[i] = 1
+        return start, end
+
+    def __getitem__(self, i: int) -> bytes:  # pyright: ignore[reportIncompatibleMethodOverride]
+        start, end = self.span(i)
+        blob = self._mapped[start:end]
+        return zlib.decompress(blob) if self.compressed else blob
+
+    def find(self, i: int, needle: bytes):
+        """
+        判断未压缩的第 i 个数据块是否包含 needle，直接在 mmap 上查找，不复制数据。
+        """
+        start, end = self.span(i)
+        return self._mapped.find(needle, start, end) != -1
+
+
+class TextColumn(Sequence[str]):
+    """
+    按需解码为字符串的数据块，用作 `SearchIndex.docs`。
+
+    UTF-8 编码下子串关系与字符串一致，因此 contains 直接在字节上匹配，不解码。
+    """
+
+    def __init__(self, blobs: BlobColumn):
+        self.blobs = blobs
+
+    def __len__(self):
+        return len(self.blobs)
+
+    def __getitem__(self, i: int) -> str:  # pyright: ignore[reportIncompatibleMethodOverride]
+        return self.blobs[i].decode()
+
+    def contains(self, i: int, keyword: str):
+        return self.blobs.find(i, keyword.encode())
+
+
+class LazyRecords(Mapping[str, MergedMapping]):
+    """
+    快照中的干员数据。
+
+    常用字段常驻内存，皮肤和档案在访问单个干员时才从 mmap 中解码，不做缓存。
+    """
+
+    def __init__(self, ids: Sequence[str], hot: Sequence[dict[str, Any]], cold: dict[str, BlobColumn]):
+        self.ids = tuple(ids)
+        self.hot = hot
+        self.cold = cold
+        self.positions = {char_id: i for i, char_id in enumerate(self.ids)}
+
+    def __getitem__(self, char_id: str) -> MergedMapping:
+        i = self.positions[char_id]
+        record = dict(self.hot[i])
+        for field, blobs in self.cold.items():
+            record[field] = json.loads(blobs[i])
+        return record  # pyright: ignore[reportReturnType]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    records: LazyRecords
+    index: SearchIndex
+    attributes: TypedAttributes
+    hot: tuple[dict[str, Any], ...]
+    size: int
+
+
+def read_snapshot(path: Path, source: Path):
+    """
+    读取快照文件。快照不存在时抛出 FileNotFoundError，损坏、版本不符或 source 在快照写出后
+    被修改过时抛出 SnapshotError。
+    """
+    with open(path, "rb") as f:
+        if path.stat().st_size < _HEADER.size:
+            raise SnapshotError("快照文件不完整")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, count = _HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise SnapshotError("不是有效的快照文件")
+    if version != VERSION:
+        raise SnapshotError(f"快照版本 {version} 与当前版本 {VERSION} 不符")
+
+    sections: dict[str, tuple[int, int, int]] = {}
+    for i in range(count):
+        name, offset, length, checksum = _SECTION.unpack_from(mapped, _HEADER.size + _SECTION.size * i)
+        if offset + length > len(mapped):
+            raise SnapshotError("快照文件不完整")
+        sections[name.rstrip(b"\x00").decode()] = (offset, length, checksum)
+    if missing := {"meta", "postings", "docs", *COLD_FIELDS} - sections.keys():
+        raise SnapshotError(f"快照缺少 {'、'.join(sorted(missing))} 段")
+
+    def checked(name: str, size: int | None = None):
+        offset, length, checksum = sections[name]
+        data = mapped[offset : offset + (length if size is None else size)]
+        if zlib.crc32(data) != checksum:
+            raise SnapshotError(f"快照 {name} 段校验失败")
+        return data
+
+    meta = json.loads(checked("meta"))
+    if meta["source"] != _fingerprint(source):
+        raise SnapshotError("快照与数据文件不一致")
+
+    blobs: dict[str, BlobColumn] = {}
+    for name in ("docs", *COLD_FIELDS):
+        column = BlobColumn(mapped, sections[name][0], name, compressed=name != "docs")
+        _ = checked(name, column.table_size)
+        if len(column) != len(meta["ids"]):
+            raise SnapshotError(f"快照 {name} 段的条目数与干员数不符")
+        blobs[name] = column
+
+    section = checked("postings")
+    (header_size,) = _COUNT.unpack_from(section, 0)
+    header = json.loads(section[_COUNT.size : _COUNT.size + header_size])
+    width: int = header["width"]
+    base = _COUNT.size + header_size
+
+    def bitmaps(grams: list[str], start: int):
+        return {
+            gram: int.from_bytes(
+                section[base + width * (start + j) : base + width * (start + j + 1)], "little"
+            )
+            for j, gram in enumerate(grams)
+        }
+
+    unigrams = bitmaps(header["unigrams"], 0)
+    bigrams = bitmaps(header["bigrams"], len(header["unigrams"]))
+
+    hot = tuple(meta["hot"])
+    docs = TextColumn(blobs["docs"])
+    index = SearchIndex.from_postings(meta["ids"], docs, unigrams, bigrams, docs.contains)
+    attributes = TypedAttributes.from_pairs(
+        {field: [tuple(pair) for pair in value["pairs"]] for field, value in meta["attributes"].items()},
+        meta["failures"],
+    )
+    records = LazyRecords(meta["ids"], hot, {field: blobs[field] for field in COLD_FIELDS})
+    return Snapshot(records, index, attributes, hot, len(mapped))
@@ -1,18 +1,364 @@
+import functools
 import json
-from collections.abc import Callable
+import os
+import re
+import stat
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
 from pathlib import Path
-from typing import TypeVar
+from typing import IO, Any, TypeVar
 
 R_contra = TypeVar("R_contra", contravariant=True)
 
 
-def require_json(*jsons: str | Path):
-    def __inner_require_json(func: Callable[..., R_contra]) -> Callable[[], R_contra]:
-        paths = [Path(f) for f in jsons]
-        def __wrapped_require_json() -> R_contra:
-            data = [json.loads(p.read_text()) for p in paths]
-            return func(*data)
+def _read_umask():
+    mask = os.umask(0)
+    _ = os.umask(mask)
+    return mask
 
-        return __wrapped_require_json
 
-    return __inner_require_json
+_UMASK = _read_umask()
+
+
+def atomic_replace(tmp_path: str | Path, path: str | Path):
+    """
+    用临时文件原子替换目标文件。mkstemp 创建的临时文件只有所有者可以读写，替换前改为目标文件
+    原有的权限；目标文件不存在时按 umask 设为普通新建文件的权限。
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def atomic_open(path: str | Path, mode: str = "w", encoding: str | None = "utf-8") -> Iterator[IO]:
+    """
+    在目标文件所在目录写入临时文件，正常退出时原子替换目标文件，出错时删除临时文件，
+    读取方不会看到写了一半的文件。
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with open(fd, mode, encoding=None if "b" in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        atomic_replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+_JSON_TOKEN = re.compile(rb'[^"\[\]{}]*(?:"(?:[^"\\]|\\.)*"|([\[\]{}]))', re.DOTALL)
+_JSON_BRACKETS = {ord("]"): ord("["), ord("}"): ord("{")}
+
+
+class JsonStreamValidator:
+    """
+    流式检查 JSON 文本的结构完整性：括号成对且类型匹配、字符串闭合、顶层值之后没有多余内容。
+
+    只保留括号栈和未处理完的字符串片段，内存占用与文件大小无关，
+    主要用于发现下载中途断开导致的截断文件，不会校验标量值的语法。
+    """
+
+    def __init__(self):
+        self._stack = bytearray()
+        self._pending = b""
+        self._closed_top_level = False
+        self._started = False
+
+    def feed(self, chunk: bytes):
+        buffer = self._pending + chunk
+        pos = 0
+        while (match := _JSON_TOKEN.match(buffer, pos)) is not None and match.end() > pos:
+            pos = match.end()
+            bracket = match.group(1)
+            if self._closed_top_level:
+                raise ValueError("JSON 顶层值之后存在多余内容")
+            self._started = True
+            if bracket is None:
+                continue
+            char = bracket[0]
+            if char in _JSON_BRACKETS:
+                if not self._stack or self._stack.pop() != _JSON_BRACKETS[char]:
+                    raise ValueError("JSON 括号不匹配")
+                if not self._stack:
+                    self._closed_top_level = True
+            else:
+                self._stack.append(char)
+
+        rest = buffer[pos:]
+        quote = rest.find(b'"')
+        if quote < 0:
+            if rest.strip() and self._closed_top_level:
+                raise ValueError("JSON 顶层值之后存在多余内容")
+            self._pending = b""
+        else:
+            # 字符串跨越了分块边界，留到下一块再处理
+            self._pending = rest[quote:]
+
+    def close(self):
+        if self._pending or self._stack or not self._started:
+            raise ValueError("JSON 内容不完整")
+
+
+Projection = dict[str, "Projection | None"]
+"""字段投影树，值为 None 表示完整解码该字段，`*` 匹配任意键"""
+
+_SKIP = object()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+def build_projection(fields: Iterable[str]) -> Projection:
+    """
+    将以 . 分隔的字段路径转换为投影树，例如 ("skinId", "displaySkin.modelName")。
+    路径经过数组时作用于数组中的每个对象；同时声明了字段和它的子字段时以完整字段为准。
+    """
+    tree: Projection = {}
+    for field in fields:
+        node = tree
+        *parents, leaf = field.split(".")
+        for parent in parents:
+            if parent in node and node[parent] is None:
+                break
+            node = node.setdefault(parent, {})  # pyright: ignore[reportAssignmentType]
+        else:
+            node[leaf] = None
+    return tree
+
+
+def project_value(value: Any, projection: Projection | None) -> Any:
+    """
+    在已经解码的值上应用投影，结果与 `JsonStreamReader.read_projected` 相同。
+    """
+    if projection is None:
+        return value
+    if isinstance(value, dict):
+        return {
+            key: project_value(item, sub)  # pyright: ignore[reportArgumentType]
+            for key, item in value.items()
+            if (sub := projection.get(key, projection.get("*", _SKIP))) is not _SKIP
+        }
+    if isinstance(value, list):
+        return [project_value(item, projection) for item in value]
+    return value
+
+
+class JsonStreamReader:
+    """
+    增量读取 JSON 文本，按投影只解码需要的字段。
+
+    对象和数组完整位于缓冲区内时交给 C 实现的 `json.JSONDecoder.raw_decode` 整体解码，
+    需要投影的在解码结果上挑出声明的字段，不需要的直接丢弃，临时对象不超过缓冲区大小；
+    否则逐层读取，不需要的值只扫描括号和字符串边界。缓冲区只保留尚未处理的部分，
+    值跨越缓冲区边界时按剩余长度倍增读取，因此内存占用只与单个值的大小有关。
+    """
+
+    def __init__(self, f: IO[str], chunk_size: int = 64 * 1024):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+
+    def _fill(self, minimum: int = 0):
+        data = self._file.read(max(self._chunk_size, minimum))
+        if not data:
+            return False
+        self._buffer = self._buffer[self._pos :] + data
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()  # pyright: ignore[reportOptionalMemberAccess]
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"JSON 格式错误：此处应为 '{char}'")
+        self._pos += 1
+
+    def _decode_buffered(self) -> Any:
+        """
+        当前位置的对象或数组完整位于缓冲区内（不足一块时先补读一块）时解码并返回，否则返回 _SKIP。
+        """
+        for _ in range(2):
+            try:
+                value, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+                return value
+            except json.JSONDecodeError:
+                if len(self._buffer) - self._pos >= self._chunk_size or not self._fill():
+                    return _SKIP
+        return _SKIP
+
+    def read_value(self) -> Any:
+        """
+        解码当前位置的完整值。
+        """
+        _ = self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill(len(self._buffer) - self._pos):
+                    raise
+                continue
+            # 数字可能在缓冲区边界处被截断（例如 "12." 之后还有 "5"），看到分隔符后再确认
+            if (end < len(self._buffer) and self._buffer[end] not in _NUMBER_CHARS) or not self._fill():
+                self._pos = end
+                return value
+
+    def skip_value(self):
+        """
+        跳过当前位置的值，对象和数组不会被解码。
+        """
+        if self._peek() not in ("{", "["):
+            _ = self.read_value()
+            return
+
+        if self._decode_buffered() is not _SKIP:
+            return
+
+        depth = 0
+        while True:
+            match = _STRUCTURAL.search(self._buffer, self._pos)
+            if match is None:
+                self._pos = len(self._buffer)
+                if not self._fill():
+                    raise ValueError("JSON 内容不完整")
+                continue
+            char = match[0]
+            if char == '"':
+                string = _STRING_REST.match(self._buffer, match.end())
+                if string is None:
+                    # 字符串跨越了缓冲区边界
+                    self._pos = match.start()
+                    if not self._fill(len(self._buffer) - self._pos):
+                        raise ValueError("JSON 内容不完整")
+                    continue
+                self._pos = string.end()
+                continue
+            self._pos = match.end()
+            depth += 1 if char in ("{", "[") else -1
+            if depth == 0:
+                return
+
+    def read_projected(self, projection: Projection | None) -> Any:
+        """
+        按投影解码当前位置的值。数组中的每个元素分别投影，其余类型的值完整解码。
+        """
+        char = self._peek()
+        if projection is None or char not in ("{", "["):
+            return self.read_value()
+        if (value := self._decode_buffered()) is not _SKIP:
+            return project_value(value, projection)
+        if char == "{":
+            return dict(self.iter_object(projection))
+
+        self._pos += 1
+        items: list[Any] = []
+        if self._peek() == "]":
+            self._pos += 1
+            return items
+        while True:
+            items.append(self.read_projected(projection))
+            char = self._peek()
+            self._pos += 1
+            if char == "]":
+                return items
+            if char != ",":
+                raise ValueError("JSON 格式错误：此处应为 ',' 或 ']'")
+
+    def iter_object(self, projection: Projection | None = None) -> Iterator[tuple[str, Any]]:
+        """
+        逐个产出当前位置对象的 (键, 值)，给出 projection 时跳过未声明的键。
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self._expect(":")
+            if projection is None:
+                yield key, self.read_value()
+            elif (sub := projection.get(key, projection.get("*", _SKIP))) is _SKIP:
+                self.skip_value()
+            else:
+                yield key, self.read_projected(sub)  # pyright: ignore[reportArgumentType]
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError("JSON 格式错误：此处应为 ',' 或 '}'")
+
+    def enter(self, key: str):
+        """
+        在当前位置的对象中找到 key 并停在它的值上，找不到或当前值不是对象时返回 False。
+        """
+        if self._peek() != "{":
+            return False
+        self._pos += 1
+        if self._peek() == "}":
+            return False
+        while True:
+            if self.read_value() == key:
+                self._expect(":")
+                return True
+            self._expect(":")
+            self.skip_value()
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return False
+            if char != ",":
+                raise ValueError("JSON 格式错误：此处应为 ',' 或 '}'")
+
+    def at_object(self):
+        return self._peek() == "{"
+
+
+def iter_json_entries(path: str | Path, *keys: str, fields: Iterable[str] | None = None):
+    """
+    流式读取 JSON 文件，逐个产出按 keys 逐层定位到的对象中的 (键, 值)。
+
+    fields 为以 . 分隔的字段路径，给出时每个值只解码其中声明的字段；
+    keys 路径之外的内容和未声明的字段都只扫描不解码。
+    """
+    projection: Projection | None = None if fields is None else {"*": build_projection(fields)}
+    with open(path, encoding="utf-8-sig") as f:
+        reader = JsonStreamReader(f)
+        for key in keys:
+            if not reader.enter(key):
+                return
+        if reader.at_object():
+            yield from reader.iter_object(projection)
+
+
+def project_json(path: str | Path, *keys: str, fields: Iterable[str]):
+    """
+    读取 JSON 数据表的装饰器，被装饰的函数接收 keys 逐层定位到的对象，其中每一项只包含声明的字段。
+    文件以流式方式读取，内存峰值与输出大小成正比，而不是与文件大小成正比。
+    """
+    fields = tuple(fields)
+
+    def __inner_project_json(func: Callable[..., R_contra]) -> Callable[[], R_contra]:
+        @functools.wraps(func)
+        def __wrapped_project_json() -> R_contra:
+            return func(dict(iter_json_entries(path, *keys, fields=fields)))
+
+        return __wrapped_project_json
+
+    return __inner_project_json
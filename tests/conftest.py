@@ -0,0 +1,46 @@
+"""
+测试的公共配置：插件模块在导入时依赖 NoneBot 与 localstore，因此在收集测试之前初始化 NoneBot，
+并把插件数据目录指向临时目录。
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import nonebot
+import pytest
+
+PLUGIN_NAME = "nonebot_plugin_ark_roulette"
+
+DATA_DIR = Path(tempfile.mkdtemp(prefix="ark-roulette-test-"))
+
+
+def pytest_configure(config: pytest.Config):
+    nonebot.init(
+        driver="~none",
+        localstore_plugin_data_dir={PLUGIN_NAME: str(DATA_DIR)},
+        update_on_launch=False,
+        log_level="WARNING",
+    )
+    _ = nonebot.load_plugin(PLUGIN_NAME)
+
+
+def pytest_unconfigure(config: pytest.Config):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def synthetic_dataset():
+    """
+    在数据目录中生成合成数据表，合并后构建数据集，返回合并数据文件的路径和数据集。
+    """
+    from synthetic import generate
+
+    from nonebot_plugin_ark_roulette.dataset import Dataset
+    from nonebot_plugin_ark_roulette.saveData import process_data, save_to_json
+
+    _ = generate(DATA_DIR, 120, 0)
+    path = DATA_DIR / "merged_character_data.json"
+    merged = process_data()
+    save_to_json(merged, path)
+    return path, Dataset.build(merged)
@@ -0,0 +1,259 @@
+"""
+数据表下载的测试：用 httpx.MockTransport 模拟主站和镜像，覆盖对冲请求、失败切换、重试退避、
+条件请求和临时文件清理。
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from pathlib import Path
+
+import httpx
+import pytest
+
+from nonebot_plugin_ark_roulette import ArkSrc
+from nonebot_plugin_ark_roulette.schemas import Manifest
+
+NAME = "test_table"
+PRIMARY = "https://primary.test/test_table.json"
+MIRROR = "https://mirror.test/test_table.json"
+BODY = json.dumps({"char_001": {"name": "测试干员"}}, ensure_ascii=False).encode()
+
+Handler = Callable[[httpx.Request], Awaitable[httpx.Response]]
+
+
+class SlowStream(httpx.AsyncByteStream):
+    """
+    等待 delay 秒后才返回第一个分块的响应体，记录是否被取消。
+    """
+
+    def __init__(self, body: bytes, delay: float, cancelled: list[str], url: str):
+        self.body = body
+        self.delay = delay
+        self.cancelled = cancelled
+        self.url = url
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(self.url)
+            raise
+        yield self.body
+
+
+def respond(body: bytes = BODY, status: int = 200, headers: dict[str, str] | None = None):
+    headers = {"Content-Length": str(len(body)), **(headers or {})}
+    return httpx.Response(status, stream=httpx.ByteStream(body), headers=headers)
+
+
+def empty_manifest() -> Manifest:
+    return {"tables": {}, "merged_inputs": {}, "sources": {}}
+
+
+def temp_files():
+    return list(ArkSrc.DATA_DIR.glob(f".{NAME}.*.tmp"))
+
+
+def fetch(handler: Handler, sources: list[str], manifest: Manifest | None = None):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await ArkSrc.fetch_data(client, NAME, sources, manifest)
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def _fetch_config(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(ArkSrc.conf, "fetch_hedge_delay", 0.05)
+    monkeypatch.setattr(ArkSrc.conf, "fetch_retries", 0)
+    monkeypatch.setattr(ArkSrc.conf, "fetch_backoff", 0.01)
+    monkeypatch.setattr(ArkSrc.conf, "validate_downloads", True)
+    yield
+    (ArkSrc.DATA_DIR / f"{NAME}.json").unlink(missing_ok=True)
+
+
+def test_hedge_fires_after_first_byte_delay_and_cancels_loser():
+    requested: dict[str, float] = {}
+    cancelled: list[str] = []
+    start = time.perf_counter()
+
+    async def handler(request: httpx.Request):
+        url = str(request.url)
+        requested[url] = time.perf_counter() - start
+        if url == PRIMARY:
+            # 立即返回响应头，但首个分块很久之后才到达，期间已经创建了临时文件
+            return httpx.Response(200, stream=SlowStream(BODY, 10, cancelled, url))
+        return respond()
+
+    result = fetch(handler, [PRIMARY, MIRROR])
+
+    assert result.changed
+    assert (ArkSrc.DATA_DIR / f"{NAME}.json").read_bytes() == BODY
+    assert requested[MIRROR] - requested[PRIMARY] >= 0.05
+    assert time.perf_counter() - start < 5
+    assert cancelled == [PRIMARY]
+    assert temp_files() == []
+
+
+def test_no_hedge_when_first_byte_arrives_in_time():
+    requested: list[str] = []
+
+    async def handler(request: httpx.Request):
+        requested.append(str(request.url))
+        return respond()
+
+    _ = fetch(handler, [PRIMARY, MIRROR])
+
+    assert requested == [PRIMARY]
+
+
+def test_error_status_falls_back_to_next_source(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(ArkSrc.conf, "fetch_hedge_delay", None)
+    requested: list[str] = []
+
+    async def handler(request: httpx.Request):
+        requested.append(str(request.url))
+        return respond(b"", 503) if request.url == PRIMARY else respond()
+
+    manifest = empty_manifest()
+    result = fetch(handler, [PRIMARY, MIRROR], manifest)
+
+    assert requested == [PRIMARY, MIRROR]
+    assert result.changed
+    assert manifest["tables"][NAME]["source"] == MIRROR
+    assert manifest["sources"]["primary.test"]["failures"] == 1
+    assert manifest["sources"]["mirror.test"]["failures"] == 0
+    assert temp_files() == []
+
+
+def test_retries_with_backoff(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(ArkSrc.conf, "fetch_retries", 2)
+    delays: list[float] = []
+    real_sleep = asyncio.sleep
+
+    async def record_sleep(delay: float, *args: object):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(ArkSrc.asyncio, "sleep", record_sleep)
+    attempts: list[str] = []
+
+    async def handler(request: httpx.Request):
+        attempts.append(str(request.url))
+        return respond() if len(attempts) > 4 else respond(b"", 502)
+
+    result = fetch(handler, [PRIMARY, MIRROR])
+
+    assert result.changed
+    # 每轮尝试所有下载源，两轮失败后第三轮成功，退避时间翻倍
+    assert attempts == [PRIMARY, MIRROR, PRIMARY, MIRROR, PRIMARY]
+    assert delays == [0.01, 0.02]
+
+
+def test_gives_up_after_retries(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(ArkSrc.conf, "fetch_retries", 1)
+
+    async def handler(request: httpx.Request):
+        return respond(b"", 500)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _ = fetch(handler, [PRIMARY, MIRROR])
+    assert not (ArkSrc.DATA_DIR / f"{NAME}.json").exists()
+    assert temp_files() == []
+
+
+def test_not_modified_keeps_local_file():
+    requests: list[httpx.Request] = []
+
+    async def handler(request: httpx.Request):
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return respond(headers={"ETag": '"v1"', "Last-Modified": "Sat, 17 Oct 2026 00:00:00 GMT"})
+
+    manifest = empty_manifest()
+    first = fetch(handler, [PRIMARY], manifest)
+    target = ArkSrc.DATA_DIR / f"{NAME}.json"
+    mtime = target.stat().st_mtime_ns
+    second = fetch(handler, [PRIMARY], manifest)
+
+    assert first.changed
+    assert first.downloaded == len(BODY)
+    assert manifest["tables"][NAME]["etag"] == '"v1"'
+    assert manifest["tables"][NAME]["sha256"] == hashlib.sha256(BODY).hexdigest()
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+    assert requests[1].headers["If-Modified-Since"] == "Sat, 17 Oct 2026 00:00:00 GMT"
+    assert not second.changed
+    assert second.downloaded == 0
+    assert second.size == len(BODY)
+    assert target.stat().st_mtime_ns == mtime
+
+
+def test_unchanged_content_does_not_rewrite_file():
+    async def handler(request: httpx.Request):
+        # 服务器不支持条件请求，每次都返回完整内容
+        return respond()
+
+    manifest = empty_manifest()
+    _ = fetch(handler, [PRIMARY], manifest)
+    target = ArkSrc.DATA_DIR / f"{NAME}.json"
+    mtime = target.stat().st_mtime_ns
+    result = fetch(handler, [PRIMARY], manifest)
+
+    assert not result.changed
+    assert result.downloaded == len(BODY)
+    assert target.stat().st_mtime_ns == mtime
+    assert temp_files() == []
+
+
+@pytest.mark.parametrize(
+    ("body", "length", "message"),
+    [
+        pytest.param(BODY[:-5], len(BODY), "下载不完整", id="truncated"),
+        pytest.param(b'{"char_001": {"name": ', None, "JSON 内容不完整", id="invalid-json"),
+    ],
+)
+def test_failed_download_removes_temp_file(body: bytes, length: int | None, message: str):
+    async def handler(request: httpx.Request):
+        return respond(body, headers={"Content-Length": str(length or len(body))})
+
+    with pytest.raises(ValueError, match=message):
+        _ = fetch(handler, [PRIMARY])
+    assert not (ArkSrc.DATA_DIR / f"{NAME}.json").exists()
+    assert temp_files() == []
+
+
+def test_failed_table_cancels_other_downloads(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    names = {f"{NAME}_{i}": f"https://primary.test/{NAME}_{i}.json" for i in range(3)}
+    failing = names[f"{NAME}_0"]
+    monkeypatch.setattr(ArkSrc, "URLS", names)
+    monkeypatch.setattr(ArkSrc, "MIRROR_URLS", {})
+    monkeypatch.setattr(ArkSrc, "MANIFEST_PATH", tmp_path / "manifest.json")
+    cancelled: list[str] = []
+
+    async def handler(request: httpx.Request):
+        url = str(request.url)
+        if url == failing:
+            return respond(b"", 500)
+        return httpx.Response(200, stream=SlowStream(BODY, 10, cancelled, url))
+
+    monkeypatch.setattr(
+        ArkSrc, "create_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+    async def run():
+        with pytest.raises(httpx.HTTPStatusError):
+            _ = await ArkSrc.fetch_and_save_data_async()
+        # 在事件循环结束、清理剩余任务之前检查，其余下载应当已被取消并等待结束
+        return list(cancelled)
+
+    start = time.perf_counter()
+    cancelled_before_return = asyncio.run(run())
+
+    assert time.perf_counter() - start < 5
+    assert sorted(cancelled_before_return) == sorted(url for url in names.values() if url != failing)
+    assert not any(ArkSrc.DATA_DIR.glob(f".{NAME}_*.tmp"))
+    assert (tmp_path / "manifest.json").is_file()
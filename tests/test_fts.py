@@ -0,0 +1,53 @@
+"""
+FTS5 检索后端与内存倒排索引的一致性测试：在合成数据集上比较两者对各类关键词的检索结果。
+"""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from nonebot_plugin_ark_roulette.dataset import Dataset
+from nonebot_plugin_ark_roulette.fts import FtsSearch, open_search
+
+KEYWORDS = [
+    # 单个字符，不足三个字符时不走 trigram 索引
+    pytest.param("干", id="1-cjk"),
+    pytest.param("7", id="1-digit"),
+    pytest.param("S", id="1-upper"),
+    pytest.param('"', id="1-quote"),
+    # 两个字符
+    pytest.param("画师", id="2-cjk"),
+    pytest.param("R7", id="2-mixed"),
+    pytest.param('""', id="2-quotes"),
+    # 三个及以上字符
+    pytest.param("龙门工业", id="3-cjk"),
+    pytest.param("默认服装", id="3-skin"),
+    pytest.param("SNIPER", id="3-upper"),
+    pytest.param("Tier_4", id="3-mixed"),
+    pytest.param("OpErAtOr00", id="3-prefix"),
+    pytest.param('"name": "干员00', id="3-quotes"),
+    pytest.param('"medic"', id="3-quoted-word"),
+    pytest.param("不存在的关键词", id="3-missing"),
+]
+
+
+@pytest.fixture(scope="module")
+def fts(synthetic_dataset: tuple[Path, Dataset]) -> Iterator[FtsSearch]:
+    path, dataset = synthetic_dataset
+    search = open_search(path, dataset.fingerprint, dataset.ids, dataset.index.docs, dataset.records)
+    yield search
+    search.close()
+
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+def test_fts_matches_index(synthetic_dataset: tuple[Path, Dataset], fts: FtsSearch, keyword: str):
+    _, dataset = synthetic_dataset
+    assert fts.search(keyword) == dataset.index.search(keyword)
+
+
+def test_keywords_cover_matches(synthetic_dataset: tuple[Path, Dataset]):
+    # 除了特意选取的无结果关键词，其余关键词都应当有命中，否则一致性测试没有意义
+    _, dataset = synthetic_dataset
+    empty = [p.values[0] for p in KEYWORDS if not dataset.index.search(p.values[0])]
+    assert empty == ["不存在的关键词"]